@@ -0,0 +1,230 @@
+#!/usr/bin/env python
+#
+# BridgeProfiler.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import time
+import types
+import logging
+import threading
+import PyV8
+
+from .Tracing import null_span
+
+log = logging.getLogger("Thug")
+
+JS = 1
+PY = 2
+
+
+class Layer(object):
+    __slots__ = ('stack', 'layer', )
+
+    def __init__(self, stack, layer):
+        self.stack = stack
+        self.layer = layer
+
+    def __enter__(self):
+        self.stack.append(self.layer)
+        return self
+
+    def __exit__(self, type, value, traceback):
+        self.stack.pop()
+        return False
+
+
+class BridgeProfiler(object):
+    """
+        Opt-in profiler of the JS to Python calls.
+
+        Once installed every attribute read and write on PyV8.JSClass
+        instances made by JS code, and every call of the methods returned
+        to JS, is counted and timed by class and attribute name. Accesses
+        are made by JS code when the innermost entry on the per-thread
+        stack is a JS entry point (see js()) rather than Python code
+        called from JS.
+    """
+    def __init__(self):
+        self.lock       = threading.Lock()
+        self.local      = threading.local()
+        self.stats      = dict()
+        self.installed  = False
+        self._orig      = None
+        self._fallbacks = list()
+
+    def _stack(self):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = list()
+
+        return stack
+
+    def js(self):
+        """
+            Context manager wrapping the Python code entering JS (eval,
+            JS function calls).
+        """
+        if not self.installed:
+            return null_span
+
+        return Layer(self._stack(), JS)
+
+    def record(self, cls, name, kind, elapsed):
+        key = (cls.__name__, name, kind)
+
+        with self.lock:
+            entry = self.stats.get(key, None)
+            if entry is None:
+                entry = self.stats[key] = [0, 0.0]
+
+            entry[0] += 1
+            entry[1] += elapsed
+
+    def _wrap(self, cls, name, method):
+        profiler = self
+
+        def wrapper(*args, **kwds):
+            stack = profiler._stack()
+            start = time.time()
+
+            with Layer(stack, PY):
+                try:
+                    return method(*args, **kwds)
+                finally:
+                    profiler.record(cls, name, 'call', time.time() - start)
+
+        return wrapper
+
+    def install(self):
+        if self.installed:
+            return
+
+        profiler = self
+        _getter  = PyV8.JSClass.__getattribute__
+        setter   = PyV8.JSClass.__setattr__
+
+        # The __getattr__ fallback of the subclasses (i.e. Window) is
+        # called here so that it is timed with the attribute access
+        def getter(self, name):
+            try:
+                return _getter(self, name)
+            except AttributeError:
+                fallback = getattr(type(self), '__getattr__', None)
+                if fallback is None:
+                    raise
+
+                try:
+                    return fallback(self, name)
+                except AttributeError:
+                    # Python calls __getattr__ once more on the way out
+                    profiler.local.missed = (id(self), name)
+                    raise
+
+        # The miss recorded above is not resolved a second time
+        def wrap(fallback):
+            def __getattr__(self, name):
+                if getattr(profiler.local, 'missed', None) == (id(self), name):
+                    profiler.local.missed = None
+                    raise AttributeError(name)
+
+                return fallback(self, name)
+
+            return __getattr__
+
+        def __getattribute__(self, name):
+            stack = profiler._stack()
+            if not stack or stack[-1] != JS:
+                return _getter(self, name)
+
+            start = time.time()
+
+            with Layer(stack, PY):
+                try:
+                    value = getter(self, name)
+                finally:
+                    profiler.record(type(self), name, 'get', time.time() - start)
+
+            if isinstance(value, types.MethodType):
+                return profiler._wrap(type(self), name, value)
+
+            return value
+
+        def __setattr__(self, name, value):
+            stack = profiler._stack()
+            if not stack or stack[-1] != JS:
+                return setter(self, name, value)
+
+            start = time.time()
+
+            with Layer(stack, PY):
+                try:
+                    setter(self, name, value)
+                finally:
+                    profiler.record(type(self), name, 'set', time.time() - start)
+
+        self._orig = dict((name, PyV8.JSClass.__dict__.get(name, None)) for name in ('__getattribute__', '__setattr__', ))
+        PyV8.JSClass.__getattribute__ = __getattribute__
+        PyV8.JSClass.__setattr__      = __setattr__
+
+        self._fallbacks = list()
+        for cls in self._subclasses(PyV8.JSClass):
+            if '__getattr__' in cls.__dict__:
+                self._fallbacks.append((cls, cls.__dict__['__getattr__']))
+                cls.__getattr__ = wrap(cls.__dict__['__getattr__'])
+
+        self.installed = True
+
+    def _subclasses(self, cls):
+        for subclass in cls.__subclasses__():
+            yield subclass
+
+            for _subclass in self._subclasses(subclass):
+                yield _subclass
+
+    def uninstall(self):
+        if not self.installed:
+            return
+
+        for name, orig in self._orig.items():
+            if orig is None:
+                delattr(PyV8.JSClass, name)
+            else:
+                setattr(PyV8.JSClass, name, orig)
+
+        for cls, fallback in self._fallbacks:
+            cls.__getattr__ = fallback
+
+        self.installed = False
+
+    def reset(self):
+        with self.lock:
+            self.stats = dict()
+
+    def report(self, top = 20):
+        with self.lock:
+            stats = [(key, entry[0], entry[1]) for key, entry in self.stats.items()]
+
+        stats.sort(key = lambda s: s[2], reverse = True)
+
+        return [{'class'   : cls,
+                 'name'    : name,
+                 'kind'    : kind,
+                 'count'   : count,
+                 'total'   : total,
+                 'average' : total / count} for (cls, name, kind), count, total in stats[:top]]
+
+
+bridge_profiler = BridgeProfiler()
@@ -0,0 +1,157 @@
+#!/usr/bin/env python
+#
+# ConnectionPool.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import time
+import logging
+import threading
+import httplib2
+
+try:
+    import urllib.parse as urlparse
+except ImportError:
+    import urlparse
+
+from .Tracing import span
+
+log = logging.getLogger("Thug")
+
+
+class ConnectionPool(object):
+    """
+        Process-wide pool of keep-alive httplib2.Http objects shared by
+        all the Navigator instances.
+
+        Every httplib2.Http object keeps its own open connections so the
+        pool stores idle Http objects per (scheme, host) and hands them
+        out again instead of building a new one (and opening a new TCP
+        and TLS connection) for each request. At most `maxsize' idle
+        objects are kept per host and objects idle for more than
+        `idle_timeout' seconds are closed when found.
+    """
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self.idle    = dict()
+        self.new     = 0
+        self.reused  = 0
+
+    def _pool_key(self, url, cache, proxy_info):
+        p = urlparse.urlparse(url)
+
+        _cache = cache if cache is None or isinstance(cache, basestring) else id(cache)
+        return (p.scheme.lower(), p.netloc.lower(), _cache, id(proxy_info))
+
+    def _conn_key(self, url):
+        try:
+            scheme, authority = httplib2.urlnorm(url)[:2]
+        except httplib2.HttpLib2Error:
+            return None
+
+        return "%s:%s" % (scheme, authority, )
+
+    def _close(self, h):
+        for conn in h.connections.values():
+            try:
+                conn.close()
+            except:
+                pass
+
+        h.connections.clear()
+
+    def acquire(self, key, cache, proxy_info, timeout, idle_timeout):
+        now = time.time()
+
+        with self.lock:
+            idle = self.idle.get(key, None)
+
+            while idle and now - idle[0][1] > idle_timeout:
+                h, since = idle.pop(0)
+                self._close(h)
+
+            if idle:
+                h, since = idle.pop()
+                return h
+
+        h = httplib2.Http(cache      = cache,
+                          proxy_info = proxy_info,
+                          timeout    = timeout,
+                          disable_ssl_certificate_validation = True)
+
+        h.force_exception_to_status_code = True
+        return h
+
+    def release(self, key, h, maxsize):
+        with self.lock:
+            idle = self.idle.setdefault(key, list())
+
+            if len(idle) < maxsize:
+                idle.append((h, time.time()))
+                return
+
+        self._close(h)
+
+    def request(self, url, method, body, headers, redirections = 1024, cache = None, proxy_info = None,
+                timeout = 10, maxsize = 4, idle_timeout = 30):
+        key = self._pool_key(url, cache, proxy_info)
+        h   = self.acquire(key, cache, proxy_info, timeout, idle_timeout)
+
+        conn = h.connections.get(self._conn_key(url), None)
+
+        reused = conn is not None and getattr(conn, 'sock', None) is not None
+
+        with self.lock:
+            if reused:
+                self.reused += 1
+            else:
+                self.new += 1
+
+        # httplib2 does not expose the connection phases, new connections
+        # (DNS and connect included) are told apart by the `reused' flag
+        try:
+            with span('fetch.http', url = url, reused = reused):
+                response, content = h.request(url,
+                                              method,
+                                              body,
+                                              redirections = redirections,
+                                              headers      = headers)
+        except:
+            self._close(h)
+            raise
+
+        self.release(key, h, maxsize)
+        return response, content
+
+    def clear(self):
+        with self.lock:
+            idle      = self.idle
+            self.idle = dict()
+
+        for entries in idle.values():
+            for h, since in entries:
+                self._close(h)
+
+    @property
+    def stats(self):
+        with self.lock:
+            return {
+                'new'    : self.new,
+                'reused' : self.reused,
+                'idle'   : sum(len(entries) for entries in self.idle.values()),
+            }
+
+
+connection_pool = ConnectionPool()
@@ -0,0 +1,277 @@
+#!/usr/bin/env python
+#
+# ContextPool.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import os
+import types
+import logging
+import threading
+import PyV8
+
+log = logging.getLogger("Thug")
+
+
+class WindowProxy(PyV8.JSClass):
+    """
+        Global object of the pooled contexts.
+
+        A JSContext global object can not be replaced once the context is
+        created so pooled contexts are built around a proxy forwarding
+        every attribute access to the window currently owning the context.
+        Window methods are returned as late bound trampolines so functions
+        saved by the prelude (i.e. `eval = window.eval') keep calling the
+        current window. Attributes set while no window is attached (that
+        is while evaluating the prelude) belong to the proxy itself and so
+        survive across windows.
+    """
+    def __init__(self, window_class):
+        object.__setattr__(self, '_window_class', window_class)
+        object.__setattr__(self, '_window', None)
+        object.__setattr__(self, '_trampolines', dict())
+
+    def attach(self, window):
+        object.__setattr__(self, '_window', window)
+
+    def detach(self):
+        object.__setattr__(self, '_window', None)
+
+    def _trampoline(self, name):
+        trampolines = object.__getattribute__(self, '_trampolines')
+
+        if name not in trampolines:
+            def trampoline(*args, **kwds):
+                return getattr(object.__getattribute__(self, '_window'), name)(*args, **kwds)
+
+            trampolines[name] = trampoline
+
+        return trampolines[name]
+
+    def __getattr__(self, name):
+        if name.startswith('__'):
+            raise AttributeError(name)
+
+        window = object.__getattribute__(self, '_window')
+
+        if isinstance(getattr(object.__getattribute__(self, '_window_class'), name, None), types.MethodType):
+            return self._trampoline(name)
+
+        if window is None:
+            if name in ('window', 'self', 'this', 'top', ):
+                return self
+
+            raise AttributeError(name)
+
+        attr = getattr(window, name)
+
+        if attr is window:
+            return self
+
+        if isinstance(attr, types.MethodType) and attr.im_self is window:
+            return self._trampoline(name)
+
+        return attr
+
+    def __setattr__(self, name, value):
+        window = object.__getattribute__(self, '_window')
+
+        if window is None:
+            object.__setattr__(self, name, value)
+        else:
+            setattr(window, name, value)
+
+    def __delattr__(self, name):
+        window = object.__getattribute__(self, '_window')
+
+        if window is None:
+            object.__delattr__(self, name)
+        else:
+            delattr(window, name)
+
+
+class PooledContext(object):
+    def __init__(self, context, proxy, personality):
+        self.context     = context
+        self.proxy       = proxy
+        self.personality = personality
+        self.baseline    = set()
+        self.pristine    = None
+
+
+class ContextPool(object):
+    """
+        Process-wide pool of pre-initialised JS contexts, one list of idle
+        contexts per personality.
+
+        Each context is created once with the global prelude (thug.js and,
+        for Internet Explorer < 8, sessionStorage.js) already evaluated.
+        Windows check a context out when they first need one. The owner of
+        a window gives it back through Window.releaseContext() once the
+        analysis is over, which removes the globals defined by the page and
+        keeps the context for the next window. A context whose builtins
+        (i.e. Object.prototype or String.prototype.replace) were changed
+        by the page is dropped instead, as the change would be seen by the
+        next page (see builtins.js). The contexts of the windows which are
+        never released are just dropped with them.
+    """
+    prelude_path = os.path.dirname(os.path.abspath(__file__))
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.idle = dict()
+
+    def _prelude(self, ctxt, personality):
+        with open(os.path.join(self.prelude_path, "thug.js"), 'r') as fd:
+            ctxt.eval(fd.read())
+
+        # The prelude depends on the personality of the pool key and not on
+        # the one currently selected
+        _personality = log.ThugOpts.Personality[personality]
+
+        if _personality['browserTag'].startswith('ie') and _personality['version'] < '8.0':
+            with open(os.path.join(self.prelude_path, "sessionStorage.js"), 'r') as fd:
+                ctxt.eval(fd.read())
+
+    def _create(self, window_class, personality):
+        proxy  = WindowProxy(window_class)
+        pooled = PooledContext(PyV8.JSContext(proxy), proxy, personality)
+
+        with pooled.context as ctxt:
+            try:
+                self._prelude(ctxt, personality)
+            except:
+                log.warning("[ContextPool] Error while evaluating the prelude")
+
+            pooled.baseline = set(ctxt.locals.keys())
+
+            # Contexts whose builtins can not be checked are never reused
+            try:
+                with open(os.path.join(self.prelude_path, "builtins.js"), 'r') as fd:
+                    pooled.pristine = ctxt.eval(fd.read())
+            except:
+                log.warning("[ContextPool] Error while taking the JS builtins snapshot")
+
+        return pooled
+
+    def warmup(self, window_class, personality, count):
+        for i in range(count):
+            pooled = self._create(window_class, personality)
+
+            with self.lock:
+                self.idle.setdefault(personality, list()).append(pooled)
+
+    def acquire(self, window):
+        personality = window._personality
+
+        with self.lock:
+            idle   = self.idle.get(personality, None)
+            pooled = idle.pop() if idle else None
+
+        if pooled is None:
+            pooled = self._create(window.__class__, personality)
+
+        pooled.proxy.attach(window)
+        return pooled
+
+    def _reset(self, pooled):
+        """
+            Removes the globals defined by the page. Returns False if the
+            context can not be reused.
+        """
+        pooled.proxy.detach()
+
+        with pooled.context as ctxt:
+            if pooled.pristine is None or not pooled.pristine():
+                return False
+
+            for name in set(ctxt.locals.keys()) - pooled.baseline:
+                try:
+                    del ctxt.locals[name]
+                except:
+                    pass
+
+        return True
+
+    def release(self, pooled, maxsize):
+        try:
+            if not self._reset(pooled):
+                log.debug("[ContextPool] JS builtins changed by the page, dropping the context")
+                return
+        except:
+            log.warning("[ContextPool] Error while resetting a JS context")
+            return
+
+        with self.lock:
+            idle = self.idle.setdefault(pooled.personality, list())
+            if len(idle) < maxsize:
+                idle.append(pooled)
+
+    def clear(self):
+        with self.lock:
+            self.idle = dict()
+
+
+context_pool = ContextPool()
+
+
+import sys
+import unittest
+
+class ContextPoolTest(unittest.TestCase):
+    class Page(PyV8.JSClass):
+        _personality = 'test'
+
+    class Pool(ContextPool):
+        # The prelude depends on ThugOpts
+        def _prelude(self, ctxt, personality):
+            pass
+
+    def setUp(self):
+        self.pool = self.Pool()
+
+    def load(self, script):
+        pooled = self.pool.acquire(self.Page())
+
+        with pooled.context as ctxt:
+            result = ctxt.eval(script)
+
+        self.pool.release(pooled, 1)
+        return pooled, result
+
+    def testReuse(self):
+        first, result = self.load("var a = 1; 'a'.replace(/a/, 'b')")
+
+        self.assertEquals('b', result)
+
+        second, result = self.load("typeof a")
+
+        self.assert_(first is second)
+        self.assertEquals('undefined', result)
+
+    def testPrototypePatched(self):
+        first, result = self.load("Object.prototype.x = 1; String.prototype.replace = function () { return 'patched'; }")
+
+        second, result = self.load("[typeof ({}).x, 'a'.replace('a', 'b')].join()")
+
+        self.failIf(first is second)
+        self.assertEquals('undefined,b', result)
+
+
+if __name__ == '__main__':
+    logging.basicConfig(level=logging.DEBUG if "-v" in sys.argv else logging.WARN,
+                        format='%(asctime)s %(levelname)s %(message)s')
+
+    unittest.main()
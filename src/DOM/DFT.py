@@ -18,6 +18,7 @@
 
 import os
 import logging
+import threading
 import PyV8
 import jsbeautifier
 from cssutils.parse import CSSParser
@@ -29,11 +30,31 @@ except ImportError:
 
 from .W3C import *
 from .W3C.DOMImplementation import DOMImplementation
+from .W3C.MutationJournal import getJournal
+from .Tracing import span
+from .BridgeProfiler import bridge_profiler
+from .GCScheduler import gc_scheduler
+from .JSLock import locked
 from .W3C.Events.Event import Event
 from .W3C.Events.MouseEvent import MouseEvent
 from .W3C.Events.HTMLEvent import HTMLEvent
+from .W3C.Events.EventListeners import getListeners
 
 log        = logging.getLogger("Thug")
+
+
+class InlineEventHandler(object):
+    """
+        Event handler registered through an HTML attribute. The handler
+        code is compiled the first time the handler is called.
+    """
+    def __init__(self, dft, code):
+        self.dft  = dft
+        self.code = code
+
+    def __call__(self, *args):
+        return self.dft.compile_event_handler(self.code)(*args)
+
     
 class DFT(object):
     javascript     = ('javascript', )
@@ -73,17 +94,25 @@ class DFT(object):
 
     window_on_events = ['on' + e for e in window_events]
 
+    # Nesting level of the runs of the current thread (frames, redirections
+    # and followed links are analysed by nested runs). Concurrent analyses
+    # run in threads of their own (see ThugAPI.ThugSession)
+    nesting = threading.local()
+
     def __init__(self, window):
         self.window            = window
         self.window.doc.DFT    = self
         self.anchors           = list()
         self.meta              = dict()
         self._context          = None
+        self._handled          = dict()
+        self.event_handlers    = dict()
         log.DFT                = self
         self._init_events()
    
     def _init_events(self):
-        self.listeners = list()
+        # Elements with listeners of each handled event type
+        self.listeners = dict()
 
         # Events are handled in the same order they are inserted in this list
         self.handled_events = ['load', 'mousemove']
@@ -91,7 +120,7 @@ class DFT(object):
         for event in log.ThugOpts.events:
             self.handled_events.append(event)
 
-        log.debug("Handling DOM Events: %s" % (",".join(self.handled_events), ))
+        log.debug("Handling DOM Events: %s", ",".join(self.handled_events))
         self.handled_on_events = ['on' + e for e in self.handled_events]
         self.dispatched_events = set()
 
@@ -136,58 +165,60 @@ class DFT(object):
 
     # Events handling
     def handle_element_event(self, evt):
-        for (elem, eventType, listener, capture) in self.listeners:
+        for elem in self.listeners.get(evt, ()):
             if getattr(elem, 'name', None) is None:
                 continue
 
             if elem.name in ('body', ):
                 continue
 
-            if eventType in (evt, ):
-                if (elem._node, evt) in self.dispatched_events:
-                    continue
+            if (elem._node, evt) in self.dispatched_events:
+                continue
             
-                elem._node.dispatchEvent(evt)
-                self.dispatched_events.add((elem._node, evt))
+            elem._node.dispatchEvent(evt)
+            self.dispatched_events.add((elem._node, evt))
 
     def handle_window_event(self, onevt):
         if onevt in self.handled_on_events:
             handler = getattr(self.window, onevt, None)
             if handler:
                 evtObject = self.get_evtObject(self.window, onevt[2:])
-                if log.ThugOpts.Personality.isIE() and log.ThugOpts.Personality.browserVersion < '9.0':
-                    self.window.event = evtObject
-                    handler()
-                else:
-                    handler(evtObject)
+
+                with self.window._runningScript(), bridge_profiler.js():
+                    if log.ThugOpts.Personality.isIE() and log.ThugOpts.Personality.browserVersion < '9.0':
+                        self.window.event = evtObject
+                        handler()
+                    else:
+                        handler(evtObject)
 
     def handle_document_event(self, onevt):
         if onevt in self.handled_on_events:
             handler = getattr(self.window.doc, onevt, None)
             if handler:
                 evtObject = self.get_evtObject(self.window.doc, onevt[2:])
-                if log.ThugOpts.Personality.isIE() and log.ThugOpts.Personality.browserVersion < '9.0':
-                    self.window.event = evtObject
-                    handler()
-                else:
-                    handler(evtObject)
 
-        #if not getattr(self.window.doc.tag, '_listeners', None):
-        #    return
+                with self.window._runningScript(), bridge_profiler.js():
+                    if log.ThugOpts.Personality.isIE() and log.ThugOpts.Personality.browserVersion < '9.0':
+                        self.window.event = evtObject
+                        handler()
+                    else:
+                        handler(evtObject)
 
-        if not '_listeners' in self.window.doc.tag.__dict__:
+        listeners = getListeners(self.window.doc.tag)
+        if not listeners:
             return
 
-        for (eventType, listener, capture) in self.window.doc.tag._listeners:
-            if not eventType in (onevt[2:], ):
-                continue
-                
+        capture_listeners, bubbling_listeners = listeners.get(onevt[2:])
+
+        for (eventType, listener, capture) in capture_listeners + bubbling_listeners:
             evtObject = self.get_evtObject(self.window.doc, eventType)
-            if log.ThugOpts.Personality.isIE() and log.ThugOpts.Personality.browserVersion < '9.0':
-                self.window.event = evtObject
-                listener()
-            else:
-                listener(evtObject)
+
+            with self.window._runningScript(), bridge_profiler.js():
+                if log.ThugOpts.Personality.isIE() and log.ThugOpts.Personality.browserVersion < '9.0':
+                    self.window.event = evtObject
+                    listener()
+                else:
+                    listener(evtObject)
 
     def build_event_handler(self, ctx, h):
         # When an event handler is registered by setting an HTML attribute
@@ -202,6 +233,19 @@ class DFT(object):
 
         return ctx.eval("(function(event) { with(document) { with(this.form || {}) { with(this) { %s } } } }) " % (h, ))
 
+    def compile_event_handler(self, h):
+        # Inline handlers with the same code (i.e. `return false') share
+        # the same compiled function
+        handler = self.event_handlers.get(h, None)
+        if handler is None:
+            with self.context as ctx:
+                handler = self.build_event_handler(ctx, h)
+
+            self.event_handlers[h] = handler
+            gc_scheduler.evaluated()
+
+        return handler
+
     def set_event_handler_attributes(self, elem):
         try:
             attrs = elem.attrs
@@ -221,8 +265,12 @@ class DFT(object):
         handler = None
 
         if isinstance(h, basestring):
-            handler = self.build_event_handler(self.context, h)
-            PyV8.JSEngine.collect()
+            # Handlers registered on the window are visible to JS code
+            # (i.e. window.onload) so they are compiled straight away
+            if getattr(elem, 'name', None) in ('body', ) and evt in self.window_on_events:
+                handler = self.compile_event_handler(h)
+            else:
+                handler = InlineEventHandler(self, h)
         elif isinstance(h, PyV8.JSFunction):
             handler = h
         else:
@@ -252,11 +300,15 @@ class DFT(object):
                 if h:
                     self.attach_event(elem, evt, h)
             
-        listeners = getattr(elem, '_listeners', None)
+        listeners = getListeners(elem)
         if listeners:
-            for (eventType, listener, capture) in listeners:
-                if eventType in self.handled_events:
-                    self.listeners.append((elem, eventType, listener, capture))
+            for eventType in listeners.types():
+                if eventType not in self.handled_events:
+                    continue
+
+                elems = self.listeners.setdefault(eventType, list())
+                if not elems or elems[-1] is not elem:
+                    elems.append(elem)
 
     @property
     def javaUserAgent(self):
@@ -374,11 +426,30 @@ class DFT(object):
 
         handler(script)
 
+    def prefetch(self, soup = None):
+        # All the resources referenced by the initial document are fetched
+        # in parallel before running any script. The handlers fetch them
+        # again later in document order and simply wait for the responses
+        # already in flight.
+        if not log.ThugOpts.prefetch_workers:
+            return
+
+        if soup is None:
+            soup = self.window.doc.doc
+
+        for script in soup.find_all('script', src = True):
+            if 'javascript' in script.get('language', 'javascript').lower():
+                self.window._navigator.prefetch(script['src'])
+
+        for embed in soup.find_all('embed', src = True):
+            self.window._navigator.prefetch(embed['src'], headers = self._embed_headers(embed))
+
     def handle_javascript(self, script):
-        try:
-            log.info(jsbeautifier.beautify(str(script)))
-        except:
-            log.info(script)
+        if log.isEnabledFor(logging.INFO):
+            try:
+                log.info(jsbeautifier.beautify(str(script)))
+            except:
+                log.info(script)
 
         src = script.get('src', None)
         if src is not None:
@@ -398,6 +469,15 @@ class DFT(object):
     def handle_noscript(self, script):
         pass
 
+    def _embed_headers(self, embed):
+        headers = dict()
+
+        embed_type = embed.get('type', None)
+        if embed_type:
+            headers['Content-Type'] = embed_type
+
+        return headers
+
     def handle_embed(self, embed):
         log.warning(embed)
 
@@ -405,14 +485,8 @@ class DFT(object):
         if src is None:
             return
 
-        headers = dict()
-
-        embed_type = embed.get('type', None)
-        if embed_type:
-            headers['Content-Type'] = embed_type
-
         try:
-            self.window._navigator.fetch(src, headers = headers, redirect_type = "embed")
+            self.window._navigator.fetch(src, headers = self._embed_headers(embed), redirect_type = "embed")
         except:
             pass
 
@@ -549,7 +623,11 @@ class DFT(object):
             
         if window:
             dft = DFT(window)
-            dft.run()
+
+            try:
+                dft.run()
+            finally:
+                window.releaseContext()
 
     def do_handle(self, child, skip=True):
         name = getattr(child, "name", None)
@@ -560,57 +638,123 @@ class DFT(object):
         if skip and name in ('object', 'applet', ):
             return False
 
+        # Nodes inserted by scripts may be reached both through the
+        # mutation journal and through the document traversal. Handled
+        # tags are kept referenced so their id is not reused
+        if id(child) in self._handled:
+            return False
+
         handler = getattr(self, "handle_%s" % (str(name.lower()), ), None)
         if handler:
+            self._handled[id(child)] = child
             handler(child)
             return True
 
         return False
 
+    def handle_mutations(self, journal):
+        while len(journal):
+            for child in journal.drain():
+                self.do_handle(child, False)
+
+    def handle_timer_mutations(self):
+        self.handle_mutations(getJournal(self.window.doc.doc))
+
+    def _timer_windows(self):
+        windows = [self.window]
+
+        for window in windows:
+            for opened in getattr(window, '_opened', ()):
+                if not any(opened is w for w in windows):
+                    windows.append(opened)
+
+        return windows
+
+    def run_timers(self):
+        # The timers of the windows opened during the analysis may fire
+        # timers of any other window so the queues are drained until none
+        # of them has a timer due within its budget. The nodes inserted by
+        # a timer are handled before the next timer fires
+        while True:
+            executed = 0
+
+            for window in self._timer_windows():
+                dft = self if window is self.window else getattr(window.doc, 'DFT', None)
+                callback = dft.handle_timer_mutations if dft else None
+                executed += window.runTimers(callback = callback)
+
+            if not executed:
+                break
+
     def _run(self, soup = None):
         log.debug(self.window.doc)
         
         if soup is None:
             soup = self.window.doc.doc
-    
-        _soup = soup
 
-        for child in soup.descendants:
-            self.set_event_handler_attributes(child)
-            if not self.do_handle(child):
-                continue
+        journal = getJournal(soup)
 
-            if tuple(soup.descendants) == tuple(_soup.descendants):
-                continue
-            
-            for _child in set(soup.descendants) - set(_soup.descendants): 
-                name = getattr(_child, "name", None)
-                if name:
-                    self.do_handle(_child, False)
-            
-            _soup = soup
+        with span('dft.traverse'):
+            for child in soup.descendants:
+                self.set_event_handler_attributes(child)
+                if not self.do_handle(child):
+                    continue
 
-        for child in soup.descendants:
-            self.set_event_listeners(child)
+                self.handle_mutations(journal)
 
-        for evt in self.handled_on_events:
-            try:
-                self.handle_window_event(evt)
-            except:
-                log.warning("[handle_window_event] Event %s not properly handled" % (evt, ))
+        with span('dft.listeners'):
+            for child in soup.descendants:
+                self.set_event_listeners(child)
 
-        for evt in self.handled_on_events:
-            try:
-                self.handle_document_event(evt)
-            except:
-                log.warning("[handle_document_event] Event %s not properly handled" % (evt, ))
+        with span('dft.events'):
+            for evt in self.handled_on_events:
+                try:
+                    self.handle_window_event(evt)
+                except:
+                    log.warning("[handle_window_event] Event %s not properly handled" % (evt, ))
 
-        for evt in self.handled_events:
-            try:
-                self.handle_element_event(evt)
-            except:
-                log.warning("[handle_element_event] Event %s not properly handled" % (evt, ))
+            for evt in self.handled_on_events:
+                try:
+                    self.handle_document_event(evt)
+                except:
+                    log.warning("[handle_document_event] Event %s not properly handled" % (evt, ))
+
+            for evt in self.handled_events:
+                try:
+                    self.handle_element_event(evt)
+                except:
+                    log.warning("[handle_element_event] Event %s not properly handled" % (evt, ))
+
+    @staticmethod
+    def nest(step):
+        DFT.nesting.depth = getattr(DFT.nesting, 'depth', 0) + step
+        return DFT.nesting.depth
 
     def run(self):
-        with self.context:
-            self._run()
+        with locked():
+            if DFT.nest(1) == 1:
+                DFT.nesting.navigator = self.window._navigator
+
+            try:
+                with span('dft.prefetch'):
+                    self.prefetch()
+
+                with self.context:
+                    self._run()
+
+                    with span('dft.timers'):
+                        self.run_timers()
+            finally:
+                # The prefetched resources the page never asked for are
+                # dropped. Nested runs (frames, followed links) may share
+                # the navigator of the outermost one, whose prefetches are
+                # dropped only once the whole analysis is over
+                depth     = DFT.nest(-1)
+                navigator = self.window._navigator
+
+                if not depth or navigator is not DFT.nesting.navigator:
+                    navigator.clear_prefetched()
+
+                if not depth:
+                    DFT.nesting.navigator = None
+                    gc_scheduler.finished()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+#
+# GCScheduler.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import os
+import time
+import logging
+import resource
+import threading
+
+log = logging.getLogger("Thug")
+
+
+class GCScheduler(object):
+    """
+        Decides when the V8 garbage collector is run.
+
+        The policy is chosen through ThugOpts.gc_policy:
+
+            eval    collect after every script evaluation and every inline
+                    event handler compilation (the legacy behaviour)
+            end     collect only at the end of the analysis
+            count   collect every ThugOpts.gc_interval evaluations
+            heap    collect once the heap usage is above
+                    ThugOpts.gc_heap_limit bytes
+
+        The V8 heap usage is used if PyV8 exposes the heap statistics,
+        otherwise the resident set size of the process is used.
+    """
+    policies = ('eval', 'end', 'count', 'heap', )
+
+    def __init__(self):
+        self.lock        = threading.Lock()
+        self.evaluations = 0
+        self.collections = 0
+        self.elapsed     = 0.0
+        self.pending     = 0
+        self.floor       = 0
+
+    def heap(self):
+        """
+            Returns the heap usage as a dictionary with the `used' and
+            `total' size in bytes and the `source' of such values.
+        """
+        # PyV8 is imported only when needed so ThugOpts (which validates
+        # the policies) can be imported by the batch process, which must
+        # not load V8 before forking the workers
+        import PyV8
+
+        statistics = getattr(PyV8.JSEngine, 'getHeapStatistics', None)
+        if statistics is not None:
+            try:
+                stats = statistics()
+                return {'source' : 'v8',
+                        'used'   : getattr(stats, 'used_heap_size', 0),
+                        'total'  : getattr(stats, 'total_heap_size', 0)}
+            except:
+                pass
+
+        return {'source' : 'rss',
+                'used'   : self.rss(),
+                'total'  : None}
+
+    def rss(self):
+        try:
+            with open('/proc/self/statm', 'r') as fd:
+                return int(fd.read().split()[1]) * resource.getpagesize()
+        except (IOError, IndexError, ValueError):
+            # The peak RSS is the best estimate left (in kilobytes on Linux)
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    def collect(self):
+        import PyV8
+
+        start = time.time()
+        PyV8.JSEngine.collect()
+        elapsed = time.time() - start
+
+        with self.lock:
+            self.collections += 1
+            self.elapsed     += elapsed
+            self.pending      = 0
+
+    def evaluated(self):
+        """
+            Called after every script evaluation (or event handler
+            compilation).
+        """
+        with self.lock:
+            self.evaluations += 1
+            self.pending     += 1
+            pending = self.pending
+
+        policy = log.ThugOpts.gc_policy
+
+        if policy in ('eval', ):
+            self.collect()
+        elif policy in ('count', ):
+            if pending >= log.ThugOpts.gc_interval:
+                self.collect()
+        elif policy in ('heap', ):
+            limit = log.ThugOpts.gc_heap_limit
+
+            # The resident set size does not shrink after a collection so
+            # the usage has to grow again by a tenth of the limit before
+            # the next one
+            if self.heap()['used'] >= max(limit, self.floor + limit / 10):
+                self.collect()
+
+                used = self.heap()['used']
+                with self.lock:
+                    self.floor = used
+
+    def finished(self):
+        """
+            Called at the end of the analysis.
+        """
+        if self.pending:
+            self.collect()
+
+    @property
+    def stats(self):
+        heap = self.heap()
+
+        with self.lock:
+            return {'evaluations' : self.evaluations,
+                    'collections' : self.collections,
+                    'gc_time'     : self.elapsed,
+                    'heap_source' : heap['source'],
+                    'heap_used'   : heap['used'],
+                    'heap_total'  : heap['total']}
+
+
+gc_scheduler = GCScheduler()
@@ -0,0 +1,140 @@
+#!/usr/bin/env python
+#
+# HTTPCache.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import time
+import hashlib
+import logging
+import sqlite3
+import threading
+
+log = logging.getLogger("Thug")
+
+
+class SQLiteCache(object):
+    """
+        httplib2 cache backend storing all the responses in a single SQLite
+        file.
+
+        httplib2 caches a response as its headers followed by the body. The
+        headers are stored per cache key while the bodies are stored once
+        per SHA-1 hash and reference counted, so the same library served
+        from thousands of different URLs takes space just once. When the
+        size of the stored bodies exceeds `max_size' bytes the least
+        recently used entries are evicted. Bodies are read through SQLite
+        memory-mapped I/O.
+    """
+    EVICT_BATCH = 64
+
+    def __init__(self, path, max_size = 1024 * 1024 * 1024):
+        self.path     = path
+        self.max_size = max_size
+        self.lock     = threading.Lock()
+        self.conn     = sqlite3.connect(path, check_same_thread = False)
+        self.conn.text_factory = str
+        self.__init_db()
+
+    def __init_db(self):
+        with self.lock:
+            self.conn.execute("PRAGMA journal_mode = WAL")
+            self.conn.execute("PRAGMA synchronous = NORMAL")
+            self.conn.execute("PRAGMA mmap_size = %d" % (self.max_size, ))
+
+            with self.conn:
+                self.conn.execute("CREATE TABLE IF NOT EXISTS bodies "
+                                  "(hash TEXT PRIMARY KEY, data BLOB, size INTEGER, refs INTEGER)")
+                self.conn.execute("CREATE TABLE IF NOT EXISTS entries "
+                                  "(key TEXT PRIMARY KEY, headers BLOB, hash TEXT, atime REAL)")
+                self.conn.execute("CREATE INDEX IF NOT EXISTS entries_atime ON entries (atime)")
+
+            self.size = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM bodies").fetchone()[0]
+
+    def _split(self, value):
+        index = value.find('\r\n\r\n')
+        if index < 0:
+            return value, ''
+
+        return value[:index + 4], value[index + 4:]
+
+    def _unref(self, h):
+        self.conn.execute("UPDATE bodies SET refs = refs - 1 WHERE hash = ?", (h, ))
+
+        row = self.conn.execute("SELECT refs, size FROM bodies WHERE hash = ?", (h, )).fetchone()
+        if row and row[0] <= 0:
+            self.conn.execute("DELETE FROM bodies WHERE hash = ?", (h, ))
+            self.size -= row[1]
+
+    def _delete(self, key):
+        row = self.conn.execute("SELECT hash FROM entries WHERE key = ?", (key, )).fetchone()
+        if row is None:
+            return
+
+        self.conn.execute("DELETE FROM entries WHERE key = ?", (key, ))
+        self._unref(row[0])
+
+    def _evict(self):
+        while self.size > self.max_size:
+            keys = self.conn.execute("SELECT key FROM entries ORDER BY atime LIMIT ?", (self.EVICT_BATCH, )).fetchall()
+            if not keys:
+                break
+
+            for (key, ) in keys:
+                self._delete(key)
+
+                if self.size <= self.max_size:
+                    break
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT entries.headers, bodies.data FROM entries "
+                                    "JOIN bodies ON entries.hash = bodies.hash "
+                                    "WHERE entries.key = ?", (key, )).fetchone()
+            if row is None:
+                return None
+
+            with self.conn:
+                self.conn.execute("UPDATE entries SET atime = ? WHERE key = ?", (time.time(), key, ))
+
+        return str(row[0]) + str(row[1])
+
+    def set(self, key, value):
+        headers, body = self._split(value)
+        h = hashlib.sha1(body).hexdigest()
+
+        with self.lock:
+            with self.conn:
+                self._delete(key)
+
+                cursor = self.conn.execute("INSERT OR IGNORE INTO bodies VALUES (?, ?, ?, 0)",
+                                           (h, sqlite3.Binary(body), len(body), ))
+                if cursor.rowcount:
+                    self.size += len(body)
+
+                self.conn.execute("UPDATE bodies SET refs = refs + 1 WHERE hash = ?", (h, ))
+                self.conn.execute("INSERT INTO entries VALUES (?, ?, ?, ?)",
+                                  (key, sqlite3.Binary(headers), h, time.time(), ))
+
+                self._evict()
+
+    def delete(self, key):
+        with self.lock:
+            with self.conn:
+                self._delete(key)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python
+#
+# JSLock.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import contextlib
+import PyV8
+
+
+@contextlib.contextmanager
+def locked():
+    """
+        Holds the V8 lock for the duration of a `with' block. Analyses
+        running concurrently in the same process (see ThugSession) enter
+        V8 one at a time. The lock may be nested in the same thread.
+    """
+    with PyV8.JSLocker():
+        yield
+
+
+@contextlib.contextmanager
+def unlocked():
+    """
+        Gives up the V8 lock held by the current thread (if any) for the
+        duration of a `with' block, so the other analyses may run while
+        this one waits (i.e. for the network).
+    """
+    if not PyV8.JSLocker.locked:
+        yield
+        return
+
+    with PyV8.JSUnlocker():
+        yield
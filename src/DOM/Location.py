@@ -72,7 +72,11 @@ class Location(PyV8.JSClass):
 
         #self._window.url = url
         dft = DFT.DFT(window)
-        dft.run()
+
+        try:
+            dft.run()
+        finally:
+            window.releaseContext()
 
     href = property(get_href, set_href)
 
@@ -21,6 +21,7 @@ import PyV8
 import httplib2
 import logging
 import datetime
+import threading
 
 try:
     import urllib.parse as urlparse
@@ -30,6 +31,10 @@ except ImportError:
 from .MimeTypes import MimeTypes
 from .Plugins import Plugins
 from .UserProfile import UserProfile
+from .ConnectionPool import connection_pool
+from .Prefetcher import prefetcher
+from .Tracing import span
+from .JSLock import unlocked
 
 log = logging.getLogger("Thug")
 
@@ -51,7 +56,9 @@ class Navigator(PyV8.JSClass):
             self._plugins.append(p['enabledPlugin'])
 
         self.__init_personality()
-        self.filecount = 0
+        self.filecount   = 0
+        self._prefetched = dict()
+        self._cancelled  = threading.Event()
 
     def __init_personality(self):
         if log.ThugOpts.Personality.isIE():
@@ -337,8 +344,96 @@ class Navigator(PyV8.JSClass):
 
         return url
 
+    def _request(self, url, method, body, http_headers):
+        return connection_pool.request(url,
+                                       method,
+                                       body,
+                                       http_headers,
+                                       redirections = 1024,
+                                       cache        = log.ThugOpts.cache,
+                                       proxy_info   = log.ThugOpts.proxy_info,
+                                       timeout      = 10,
+                                       maxsize      = log.ThugOpts.connection_pool_size,
+                                       idle_timeout = log.ThugOpts.connection_idle_timeout)
+
+    def _expired(self):
+        return log.ThugOpts.timeout is not None and datetime.datetime.now() > log.ThugOpts.timeout
+
+    def _prefetch_request(self, url, http_headers, cancelled):
+        # The request may wait in the prefetcher queue past the analysis
+        # deadline or the end of the run
+        if cancelled.is_set() or self._expired():
+            return None
+
+        return self._request(url, 'GET', None, http_headers)
+
+    def prefetch(self, url, headers = None):
+        """
+            Start fetching `url' in background. A later fetch() of the same
+            URL (with the same request headers) waits for this response
+            instead of sending a new request.
+
+            The pending prefetches are counted against the fetch threshold
+            so the requests sent for a page stay within the same budget.
+        """
+        if log.ThugOpts.no_fetch or not log.ThugOpts.prefetch_workers:
+            return
+
+        if log.ThugOpts.threshold and self.filecount + len(self._prefetched) + 1 >= log.ThugOpts.threshold:
+            return
+
+        if self._expired():
+            return
+
+        if url.startswith('//'):
+            url = self.__normalize_protocol_relative_url(url)
+
+        _url = urlparse.urlparse(url)
+
+        # URLs whose scheme has a handler are not prefetched because the
+        # handler has side effects which must happen in document order
+        if _url.scheme and _url.scheme.lower() not in ('http', 'https', ):
+            return
+
+        if not _url.netloc:
+            url = urlparse.urljoin(self._window.url, url)
+
+        if not urlparse.urlparse(url).scheme in ('http', 'https', ):
+            return
+
+        if url in self._prefetched:
+            return
+
+        http_headers = self.__build_http_headers(headers)
+        self._prefetched[url] = (http_headers, prefetcher.submit(self._prefetch_request, url, http_headers, self._cancelled))
+
+    def clear_prefetched(self):
+        """
+            Drop the prefetched responses which were never fetched. The
+            requests still waiting in the prefetcher queue are not sent.
+        """
+        self._cancelled.set()
+        self._cancelled  = threading.Event()
+        self._prefetched = dict()
+
+    def __pop_prefetched(self, url, method, body, http_headers):
+        if method.upper() not in ('GET', ) or body:
+            return None
+
+        prefetched = self._prefetched.pop(url, None)
+        if prefetched is None:
+            return None
+
+        # If the request headers changed in the meanwhile (i.e. a cookie was
+        # set by a script) the prefetched response is discarded
+        _http_headers, result = prefetched
+        if _http_headers != http_headers:
+            return None
+
+        return result
+
     def fetch(self, url, method="GET", headers=None, body=None, redirect_type=None):
-        print "FETCH", url
+        log.debug("[Navigator] Fetching %s", url)
         if log.ThugOpts.no_fetch:
             raise FetchForbidden
 
@@ -354,23 +449,33 @@ class Navigator(PyV8.JSClass):
         if log.ThugOpts.threshold and self.filecount >= log.ThugOpts.threshold:
             return
 
-        if log.ThugOpts.timeout is not None and datetime.datetime.now() > log.ThugOpts.timeout:
+        if self._expired():
             return
 
         http_headers = self.__build_http_headers(headers)
 
-        h = httplib2.Http(cache      = log.ThugOpts.cache,
-                          proxy_info = log.ThugOpts.proxy_info,
-                          timeout    = 10,
-                          disable_ssl_certificate_validation = True)
-
-        h.force_exception_to_status_code = True
-
-        response, content = h.request(url,
-                                      method.upper(),
-                                      body,
-                                      redirections = 1024,
-                                      headers = http_headers)
+        prefetched = self.__pop_prefetched(url, method, body, http_headers)
+
+        # Waiting for a prefetched response is traced as well. The other
+        # analyses of the process may enter V8 in the meanwhile
+        with span('fetch.request', url = url, prefetched = prefetched is not None), unlocked():
+            if prefetched is not None:
+                prefetched = prefetched.get()
+
+            # A prefetch dropped at the deadline is not sent again
+            if prefetched is not None:
+                response, content = prefetched
+            elif self._expired():
+                return
+            else:
+                response, content = self._request(url, method.upper(), body, http_headers)
+
+        session = getattr(log, 'ThugSession', None)
+        if session is not None:
+            session.fetched.append({'url'    : url,
+                                    'method' : method.upper(),
+                                    'status' : response.status,
+                                    'size'   : len(content) if content else 0, })
 
         if response.status == 404:
             return response, content
@@ -16,6 +16,10 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston,
 # MA  02111-1307  USA
 
+import logging
+
+log = logging.getLogger("Thug")
+
 
 class Plugin(dict):
     """A dictionary with attribute-style access. It maps attribute access to
@@ -40,7 +44,7 @@ class Plugin(dict):
         try:
             return super(Plugin, self).__getitem__(name)
         except KeyError:
-            print "KeyError:", name, "->", self
+            log.debug("[Plugin] Attribute not found: %s", name)
             return ""
 
     def __delitem__(self, name):
@@ -16,8 +16,12 @@
 # Foundation, Inc., 59 Temple Place, Suite 330, Boston,
 # MA  02111-1307  USA
 
+import logging
+
 from .Plugin import Plugin
 
+log = logging.getLogger("Thug")
+
 class Plugins(list):
     def __init__(self):
         list.__init__(self)
@@ -52,7 +56,7 @@ class Plugins(list):
 
             index += 1
 
-        print 'PLUGIN NOT FOUND:', name
+        log.debug("[Plugins] Plugin not found: %s", name)
         return Plugin()
 
     def refresh(self, reloadDocuments = False):
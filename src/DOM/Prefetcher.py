@@ -0,0 +1,63 @@
+#!/usr/bin/env python
+#
+# Prefetcher.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import logging
+import threading
+from multiprocessing.pool import ThreadPool
+
+log = logging.getLogger("Thug")
+
+
+class Prefetcher(object):
+    """
+        Process-wide bounded thread pool used for fetching in parallel the
+        resources found in a document before any script is executed.
+
+        submit() returns an AsyncResult whose get() method waits for the
+        response (or raises the exception raised while fetching it). The
+        workers run in the analysis session (see ThugAPI.ThugSession) of
+        the submitting thread.
+    """
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self.pool    = None
+        self.workers = 0
+
+    def submit(self, func, *args):
+        workers = log.ThugOpts.prefetch_workers
+
+        with self.lock:
+            if self.pool is None or self.workers != workers:
+                if self.pool:
+                    self.pool.close()
+
+                self.pool    = ThreadPool(workers)
+                self.workers = workers
+
+            return self.pool.apply_async(self._run, (getattr(log, 'ThugSession', None), func, args, ))
+
+    @staticmethod
+    def _run(session, func, args):
+        if session is None:
+            return func(*args)
+
+        with session:
+            return func(*args)
+
+
+prefetcher = Prefetcher()
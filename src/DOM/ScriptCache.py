@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+#
+# ScriptCache.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import os
+import logging
+import hashlib
+import threading
+import collections
+import PyV8
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from .BridgeProfiler import bridge_profiler
+
+log = logging.getLogger("Thug")
+
+
+class ScriptCache(object):
+    """
+        Process-wide cache of V8 precompilation data keyed by the SHA-1 of
+        the script source.
+
+        The same library builds are evaluated on almost every page so the
+        precompilation data produced by JSEngine.precompile() is kept and
+        handed back to JSEngine.compile() the next time the same source is
+        evaluated, in whatever context, thus skipping the parsing step. The
+        precompilation data is context independent so it can be saved to
+        disk and loaded again after a worker restart.
+
+        The cache is a LRU bounded to ThugOpts.script_cache_size entries.
+        Scripts shorter than `min_length' are not worth the hashing and are
+        simply evaluated.
+    """
+    min_length = 1024
+
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self.entries = collections.OrderedDict()
+        self.hits    = 0
+        self.misses  = 0
+
+    @property
+    def supported(self):
+        return hasattr(PyV8.JSEngine, 'precompile')
+
+    def key(self, script):
+        if isinstance(script, unicode):
+            script = script.encode('utf-8')
+
+        return hashlib.sha1(script).hexdigest()
+
+    def lookup(self, key):
+        with self.lock:
+            data = self.entries.pop(key, None)
+            if data is None:
+                self.misses += 1
+                return None
+
+            self.entries[key] = data
+            self.hits += 1
+            return data
+
+    def store(self, key, data):
+        maxsize = log.ThugOpts.script_cache_size
+
+        with self.lock:
+            self.entries[key] = data
+
+            while len(self.entries) > maxsize:
+                self.entries.popitem(last = False)
+
+    def eval(self, ctxt, script):
+        with bridge_profiler.js():
+            return self._eval(ctxt, script)
+
+    def _eval(self, ctxt, script):
+        if not log.ThugOpts.script_cache_size or len(script) < self.min_length or not self.supported:
+            return ctxt.eval(script)
+
+        key = self.key(script)
+
+        with PyV8.JSEngine() as engine:
+            data = self.lookup(key)
+            if data is None:
+                data = str(engine.precompile(script))
+                self.store(key, data)
+
+            return engine.compile(script, precompiled = data).run()
+
+    @property
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+
+            return {
+                'hits'     : self.hits,
+                'misses'   : self.misses,
+                'entries'  : len(self.entries),
+                'hit_rate' : float(self.hits) / lookups if lookups else 0.0,
+            }
+
+    def load(self, path):
+        if not os.path.exists(path):
+            return
+
+        try:
+            with open(path, 'rb') as fd:
+                entries = pickle.load(fd)
+        except:
+            log.warning("[ScriptCache] Unable to load %s" % (path, ))
+            return
+
+        with self.lock:
+            for key, data in entries:
+                self.entries[key] = data
+
+    def save(self, path):
+        with self.lock:
+            entries = list(self.entries.items())
+
+        with open(path, 'wb') as fd:
+            pickle.dump(entries, fd, pickle.HIGHEST_PROTOCOL)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits   = 0
+            self.misses = 0
+
+
+script_cache = ScriptCache()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python
+#
+# TimerQueue.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import heapq
+import logging
+import traceback
+
+log = logging.getLogger("Thug")
+
+
+class TimerQueue(object):
+    """
+        Per-window virtual time task queue for setTimeout/setInterval.
+
+        Timers are ordered by due time (in milliseconds of virtual time)
+        and nothing really sleeps: when the queue is drained the virtual
+        clock simply jumps to the due time of the next timer. Draining
+        stops when the queue is empty or when the next timer is due
+        after the deadline set by the virtual time budget passed to the
+        first run(). Later runs keep the same deadline so draining the
+        queue again can not push an interval past the budget.
+
+        The number of executions is bounded as well, as short intervals
+        may otherwise fire thousands of times within the budget.
+    """
+    # Browsers clamp nested timers to 4ms. The same lower bound is used
+    # for intervals so a setInterval(f, 0) cannot spin forever at the
+    # same virtual instant.
+    MIN_INTERVAL = 4
+
+    def __init__(self):
+        self.clock    = 0
+        self.queue    = list()
+        self.seq      = 0
+        self.deadline = None
+        self.executed = 0
+
+    def __len__(self):
+        return len(self.queue)
+
+    def schedule(self, timer, delay):
+        heapq.heappush(self.queue, (self.clock + delay, self.seq, timer))
+        self.seq += 1
+
+    def run(self, budget, limit = 0, callback = None):
+        """
+        Execute the timers due before the deadline, calling `callback'
+        after each of them, until `limit' timers were executed by all
+        the runs (0 means no limit). Returns the number of timers
+        executed by this run.
+        """
+        if self.deadline is None:
+            self.deadline = self.clock + budget
+
+        executed = 0
+
+        while self.queue:
+            due, seq, timer = self.queue[0]
+            if due > self.deadline:
+                break
+
+            if limit and self.executed >= limit:
+                log.warning("[Timers] Limit of %d timer executions reached, %d timers dropped" % (limit, len(self.queue), ))
+                self.queue = list()
+                break
+
+            heapq.heappop(self.queue)
+
+            if not timer.running:
+                continue
+
+            self.clock = max(self.clock, due)
+
+            try:
+                timer.execute()
+            except:
+                log.debug(traceback.format_exc())
+                log.warning("Error while handling Window timer")
+
+            executed      += 1
+            self.executed += 1
+
+            if callback is None:
+                continue
+
+            try:
+                callback()
+            except:
+                log.debug(traceback.format_exc())
+                log.warning("Error while handling the Window timer side effects")
+
+        return executed
@@ -0,0 +1,132 @@
+#!/usr/bin/env python
+#
+# Tracing.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import os
+import time
+import json
+import logging
+import threading
+
+log = logging.getLogger("Thug")
+
+
+class NullSpan(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, type, value, traceback):
+        return False
+
+
+null_span = NullSpan()
+
+
+class Span(object):
+    __slots__ = ('tracer', 'name', 'args', 'start', )
+
+    def __init__(self, tracer, name, args):
+        self.tracer = tracer
+        self.name   = name
+        self.args   = args
+        self.start  = None
+
+    def __enter__(self):
+        self.start = time.time()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        if type is not None:
+            self.args['error'] = type.__name__
+
+        self.tracer.add(self.name, self.start, time.time() - self.start, self.args)
+        return False
+
+
+class Tracer(object):
+    """
+        Records timing spans of an analysis.
+
+        Spans are named `category.phase' (i.e. `fetch.request') and can be
+        exported as Chrome trace event JSON (chrome://tracing) or reduced
+        to a summary with the time spent in each phase and the slowest
+        spans.
+    """
+    def __init__(self):
+        self.lock   = threading.Lock()
+        self.events = list()
+        self.pid    = os.getpid()
+
+    def span(self, name, args):
+        return Span(self, name, args)
+
+    def add(self, name, start, duration, args):
+        with self.lock:
+            self.events.append((name, start, duration, threading.current_thread().ident, args))
+
+    def trace(self):
+        events = list()
+
+        with self.lock:
+            for name, start, duration, tid, args in self.events:
+                events.append({
+                    'name' : name,
+                    'cat'  : name.split('.')[0],
+                    'ph'   : 'X',
+                    'ts'   : int(start * 1000000),
+                    'dur'  : int(duration * 1000000),
+                    'pid'  : self.pid,
+                    'tid'  : tid,
+                    'args' : args,
+                })
+
+        return {'traceEvents' : events}
+
+    def export(self, path):
+        with open(path, 'w') as fd:
+            json.dump(self.trace(), fd)
+
+    def summary(self, top = 10):
+        phases = dict()
+
+        with self.lock:
+            events = list(self.events)
+
+        for name, start, duration, tid, args in events:
+            phase = phases.setdefault(name, {'count' : 0, 'total' : 0.0, 'max' : 0.0})
+            phase['count'] += 1
+            phase['total'] += duration
+            phase['max']    = max(phase['max'], duration)
+
+        slowest = sorted(events, key = lambda e: e[2], reverse = True)[:top]
+
+        return {
+            'phases'  : phases,
+            'slowest' : [{'name' : e[0], 'duration' : e[2], 'args' : e[4]} for e in slowest],
+        }
+
+
+def span(name, **args):
+    """
+        Returns a context manager recording a span with the tracer of the
+        current analysis, if tracing is enabled (see ThugAPI.set_tracing).
+    """
+    tracer = getattr(log, 'ThugTracer', None)
+    if tracer is None:
+        return null_span
+
+    return tracer.span(name, args)
@@ -7,6 +7,8 @@ import PyV8
 
 from DOMException import DOMException
 from Node import Node
+from DocumentIndex import recordAttribute
+from Style.CSS.CSSStyleDeclaration import flushStyle
 
 class Attr(Node):
     _value = ""
@@ -80,6 +82,8 @@ class Attr(Node):
     
     def getValue(self):
         if self.parent:
+            flushStyle(self.parent.tag)
+
             if self.parent.tag.has_attr(self.attr):
                 self._specified = True
                 return self.parent.tag[self.attr]
@@ -92,6 +96,7 @@ class Attr(Node):
         if self.parent:
             self._specified = True
             self.parent.tag[self.attr] = value
+            recordAttribute(self.parent.tag, self.attr)
         
     value = property(getValue, setValue)
 
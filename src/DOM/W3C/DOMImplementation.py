@@ -104,12 +104,21 @@ class DOMImplementation(HTMLDocument.HTMLDocument):
         
     @staticmethod
     def createHTMLElement(doc, tag):
-        if log.ThugOpts.Personality.isIE():
-            if tag.name.lower() in ('t:animatecolor', ):
-                return TAnimateColor.TAnimateColor(doc, tag)
+        name = tag.name.lower()
 
-        if tag.name.lower() in DOMImplementation.TAGS:
-            return DOMImplementation.TAGS[tag.name.lower()](doc, tag)
+        if log.ThugOpts.Personality.isIE() and name in ('t:animatecolor', ):
+            cls = TAnimateColor.TAnimateColor
         else:
-            return HTMLElement.HTMLElement(doc, tag)
+            cls = DOMImplementation.TAGS.get(name, HTMLElement.HTMLElement)
+
+        # Each tag keeps a reference to its wrapper (see Element.__init__)
+        # which is returned again so that the same tag is always seen as
+        # the same object from JS. Node.wrap goes through here as well so
+        # a wrapper of another class is only found if the personality
+        # changed (i.e. t:animatecolor) and is then replaced
+        node = tag.__dict__.get('_node', None)
+        if type(node) is cls:
+            return node
+
+        return cls(doc, tag)
 
@@ -19,6 +19,8 @@ import bs4 as BeautifulSoup
 import PyV8
 
 from DOMException import DOMException
+from DocumentIndex import getIndex
+from Style.CSS.CSSStyleDeclaration import flushStyles
 from Node import Node
 from NodeList import NodeList
 from DocumentFragment import DocumentFragment
@@ -35,9 +37,11 @@ from Views.DocumentView import DocumentView
 
 class Document(Node, DocumentEvent, DocumentView):
     def __str__(self):
+        flushStyles(self.doc)
         return str(self.doc)
 
     def __unicode__(self):
+        flushStyles(self.doc)
         return unicode(self.doc)
 
     def __repr__(self):
@@ -73,7 +77,10 @@ class Document(Node, DocumentEvent, DocumentView):
     
     @property
     def documentElement(self):
-        return Element(self, self.doc.find('html'))
+        from DOMImplementation import DOMImplementation
+
+        tag = self.doc.find('html')
+        return DOMImplementation.createHTMLElement(self, tag) if tag else None
         
     onCreateElement = None
     
@@ -114,14 +121,28 @@ class Document(Node, DocumentEvent, DocumentView):
         return EntityReference(self, name)
     
     def getElementsByTagName(self, tagname):
+        index = getIndex(self.doc)
+
         if log.ThugOpts.Personality.isIE() and tagname in ('*', ):
+            if index:
+                return NodeList(self.doc, index.getAllElements)
+
             s = [p for p in self.doc.find_all(text = False)]
             return NodeList(self.doc, s)
 
-        return NodeList(self.doc, self.doc.find_all(tagname.lower()))
+        tagname = tagname.lower()
+
+        if index:
+            return NodeList(self.doc, lambda: index.getElementsByTagName(tagname))
+
+        return NodeList(self.doc, self.doc.find_all(tagname))
     
     @property
     def all(self):
+        index = getIndex(self.doc)
+        if index:
+            return NodeList(self.doc, index.getAllElements)
+
         s = [p for p in self.doc.find_all(text = False)]
         return NodeList(self.doc, s)
 
@@ -135,7 +156,8 @@ class Document(Node, DocumentEvent, DocumentView):
     def _getElementById(self, elementId):
         from DOMImplementation import DOMImplementation
 
-        tag = self.doc.find(id = elementId)
+        index = getIndex(self.doc)
+        tag   = index.lookup('id', elementId) if index else self.doc.find(id = elementId)
         return DOMImplementation.createHTMLElement(self, tag) if tag else None
 
     # Internet Explorer 6 and 7 getElementById is broken and returns 
@@ -143,27 +165,11 @@ class Document(Node, DocumentEvent, DocumentView):
     def _getElementById_IE67(self, elementId):
         from DOMImplementation import DOMImplementation
 
-        def _match_tag(tag, p):
-            return p in tag.attrs and tag.attrs[p] == elementId
-
-        def match_tag(tag, id):
-            if _match_tag(tag, id):
-                return True
-
-            return False
-
-        def filter_tags_id(tag):
-            return tag.has_attr('id')
-
-        def filter_tags_name(tag):
-            return tag.has_attr('name')
-
-        for tag in self.doc.find_all(filter_tags_id):
-            if match_tag(tag, 'id'):
-                return DOMImplementation.createHTMLElement(self, tag)
+        index = getIndex(self.doc)
 
-        for tag in self.doc.find_all(filter_tags_name):
-            if match_tag(tag, 'name'):
+        for attr in ('id', 'name', ):
+            tag = index.lookup(attr, elementId) if index else self.doc.find(attrs = {attr: elementId})
+            if tag:
                 return DOMImplementation.createHTMLElement(self, tag)
 
         return None
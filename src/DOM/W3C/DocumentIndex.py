@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+import bs4 as BeautifulSoup
+
+from MutationJournal import getRoot, getJournal, getStructure, recordMutation
+
+
+class DocumentIndex(object):
+    # Maps the values of the 'id' and 'name' attributes to the tags of a
+    # document. The index is built the first time it is needed and then
+    # kept up to date by the attribute setters and the tree insertions.
+    # Tags are never removed from the index, stale entries (tags which
+    # left the document or whose attribute changed) are discarded when
+    # looked up.
+    #
+    # The tag name index (and the results memoised through memo()) is
+    # instead rebuilt in a single walk of the tree the first time it is
+    # needed after the structure of the document changed, that is after
+    # an insertion, a removal or a change of one of the `structural'
+    # attributes (the documents links are the anchors with an href).
+    # Other attribute changes (i.e. style, src or value) keep it valid.
+    attrs      = ('id', 'name', )
+    structural = ('id', 'name', 'class', 'href', )
+
+    def __init__(self, root):
+        self.root       = root
+        self.journal    = getJournal(root)
+        self.indexes    = dict((attr, dict()) for attr in self.attrs)
+        self.generation = None
+        self.elements   = list()
+        self.tags       = dict()
+        self.memos      = dict()
+
+        self.add(root)
+
+    def _add(self, tag):
+        for attr in self.attrs:
+            value = tag.attrs.get(attr, None)
+            if value is None:
+                continue
+
+            tags = self.indexes[attr].setdefault(value, list())
+            if not any(t is tag for t in tags):
+                tags.append(tag)
+
+    def add(self, node):
+        if not isinstance(node, BeautifulSoup.Tag):
+            return
+
+        self._add(node)
+
+        for child in node.descendants:
+            if isinstance(child, BeautifulSoup.Tag):
+                self._add(child)
+
+    def update(self, tag, attr):
+        if attr in self.attrs:
+            self._add(tag)
+
+    def _valid(self, tag, attr, value):
+        return tag.attrs.get(attr, None) == value and getRoot(tag) is self.root
+
+    def lookup(self, attr, value):
+        tags = self.indexes[attr].get(value, None)
+        if not tags:
+            return None
+
+        tags[:] = [t for t in tags if self._valid(t, attr, value)]
+
+        if not tags:
+            return None
+
+        if len(tags) == 1:
+            return tags[0]
+
+        # The index does not keep the document order so duplicated
+        # values are resolved by walking the tree
+        return self.root.find(attrs = {attr: value})
+
+    def _build(self):
+        if self.generation == self.journal.structure:
+            return
+
+        elements = list()
+        tags     = dict()
+
+        for child in self.root.descendants:
+            if not isinstance(child, BeautifulSoup.Tag):
+                continue
+
+            elements.append(child)
+            tags.setdefault(child.name, list()).append(child)
+
+        self.elements   = elements
+        self.tags       = tags
+        self.memos      = dict()
+        self.generation = self.journal.structure
+
+    def getAllElements(self):
+        self._build()
+        return self.elements
+
+    def getElementsByTagName(self, name):
+        self._build()
+        return self.tags.get(name, [])
+
+    def memo(self, key, compute):
+        self._build()
+
+        if key not in self.memos:
+            self.memos[key] = compute()
+
+        return self.memos[key]
+
+
+def getIndex(tag):
+    root = getRoot(tag)
+    if not isinstance(root, BeautifulSoup.BeautifulSoup):
+        return None
+
+    index = root.__dict__.get('_index', None)
+    if index is None:
+        index = DocumentIndex(root)
+        root.__dict__['_index'] = index
+
+    return index
+
+
+def recordAttribute(tag, attr):
+    recordMutation(tag, attr in DocumentIndex.structural)
+
+    if attr not in DocumentIndex.attrs:
+        return
+
+    # An index not built yet will find the tag on its own
+    root  = getRoot(tag)
+    index = root.__dict__.get('_index', None) if isinstance(root, BeautifulSoup.BeautifulSoup) else None
+    if index is not None:
+        index.update(tag, attr)
+
+
+class LiveNodes(object):
+    # Callable returning the nodes of a live NodeList or HTMLCollection
+    # built on a subtree. The nodes are computed again only when the
+    # structure of the document changed. Detached subtrees have no
+    # journal and are computed on every access.
+    def __init__(self, tag, compute):
+        self.tag        = tag
+        self.compute    = compute
+        self.generation = None
+        self.nodes      = None
+
+    def __call__(self):
+        generation = getStructure(self.tag)
+
+        if generation is None or generation != self.generation:
+            self.nodes      = self.compute()
+            self.generation = generation
+
+        return self.nodes
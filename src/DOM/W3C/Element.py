@@ -13,8 +13,10 @@ except ImportError:
 from Attr import Attr
 from Node import Node
 from DOMException import DOMException
+from DocumentIndex import recordAttribute, LiveNodes
 
 from Style.CSS.ElementCSSInlineStyle import ElementCSSInlineStyle
+from Style.CSS.CSSStyleDeclaration import flushStyle, flushStyles
 log = logging.getLogger("Thug")
 
 
@@ -25,9 +27,11 @@ class Element(Node, ElementCSSInlineStyle):
         Node.__init__(self, doc)
 
     def __str__(self):
+        flushStyles(self.tag)
         return str(self.tag)
 
     def __unicode__(self):
+        flushStyles(self.tag)
         return unicode(self.tag)
         
     def __repr__(self):
@@ -51,6 +55,7 @@ class Element(Node, ElementCSSInlineStyle):
     @property
     def attributes(self):
         from NamedNodeMap import NamedNodeMap
+        flushStyle(self.tag)
         return NamedNodeMap(self)    
     
     @property
@@ -85,6 +90,7 @@ class Element(Node, ElementCSSInlineStyle):
 
     # Introduced in DOM Level 2
     def hasAttribute(self, name):
+        flushStyle(self.tag)
         return self.tag.has_attr(name)
         
     @property
@@ -95,6 +101,8 @@ class Element(Node, ElementCSSInlineStyle):
         if not isinstance(name, basestring):
             name = str(name)
 
+        flushStyle(self.tag)
+
         if log.ThugOpts.Personality.isIE():
             if log.ThugOpts.Personality.browserVersion < '8.0':
                 # flags parameter is only supported in Internet Explorer earlier 
@@ -124,6 +132,7 @@ class Element(Node, ElementCSSInlineStyle):
             name = str(name)
 
         self.tag[name] = value
+        recordAttribute(self.tag, name)
 
         if name.lower() in ('src', 'archive'):
             s = urlparse.urlsplit(value)
@@ -149,19 +158,23 @@ class Element(Node, ElementCSSInlineStyle):
 
     def removeAttribute(self, name):
         del self.tag[name]
+        recordAttribute(self.tag, name)
         
     def getAttributeNode(self, name):
+        flushStyle(self.tag)
         return Attr(self.doc, self, name) if self.tag.has_attr(name) else None
     
     def setAttributeNode(self, attr):
         self.tag[attr.name] = attr.value
+        recordAttribute(self.tag, attr.name)
     
     def removeAttributeNode(self, attr):
         del self.tag[attr.name]
+        recordAttribute(self.tag, attr.name)
     
     def getElementsByTagName(self, tagname):
         from NodeList import NodeList
-        return NodeList(self.doc, self.tag.find_all(tagname))
+        return NodeList(self.doc, LiveNodes(self.tag, lambda: self.tag.find_all(tagname)))
         #return self.doc.getElementsByTagName(tagname)
 
     # DOM Level 2 Core [Appendix A]
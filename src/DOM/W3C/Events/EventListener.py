@@ -10,5 +10,5 @@ class EventListener:
         pass
 
     def handleEvent(self, evt):
-        log.debug('handleEvent(%s)' % (evt, ))
+        log.debug('handleEvent(%s)', evt)
 
@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+import itertools
+import bs4 as BeautifulSoup
+import logging
+log = logging.getLogger("Thug")
+
+
+class EventListeners(object):
+    """
+        Listeners registered on an event target, kept by event type in
+        separate capture and bubbling lists.
+    """
+    def __init__(self):
+        self.capture = dict()
+        self.bubble  = dict()
+
+    def _listeners(self, capture):
+        return self.capture if capture else self.bubble
+
+    def __nonzero__(self):
+        return any(self.capture.values()) or any(self.bubble.values())
+
+    def __iter__(self):
+        for listeners in (self.capture, self.bubble, ):
+            for eventType, _listeners in listeners.items():
+                for (listener, capture) in _listeners:
+                    yield (eventType, listener, capture)
+
+    def __contains__(self, item):
+        eventType, listener, capture = item
+        return (listener, bool(capture)) in self._listeners(capture).get(eventType, ())
+
+    def add(self, eventType, listener, capture, prio = False):
+        listeners = self._listeners(capture).setdefault(eventType, list())
+
+        if prio:
+            listeners.insert(0, (listener, bool(capture)))
+        else:
+            listeners.append((listener, bool(capture)))
+
+    def remove(self, eventType, listener, capture):
+        try:
+            self._listeners(capture).get(eventType, list()).remove((listener, bool(capture)))
+        except ValueError:
+            pass
+
+    def get(self, eventType):
+        """
+            Returns the (capture, bubbling) listeners of eventType as lists
+            of (eventType, listener, capture) tuples.
+        """
+        return ([(eventType, listener, capture) for (listener, capture) in self.capture.get(eventType, ())],
+                [(eventType, listener, capture) for (listener, capture) in self.bubble.get(eventType, ())])
+
+    def types(self):
+        return set(eventType for listeners in (self.capture, self.bubble, ) for eventType, _listeners in listeners.items() if _listeners)
+
+
+def getListeners(tag, create = False):
+    listeners = tag.__dict__.get('_listeners', None)
+    if listeners is None and create:
+        listeners = tag.__dict__['_listeners'] = EventListeners()
+
+    return listeners
+
+
+# The event types listened anywhere in a tree are kept in the root of the
+# tree so dispatching an event nobody listens to costs nothing. The set
+# is never shrunk (removing a listener leaves its type in the set).
+def _root(tag):
+    root = tag
+
+    while getattr(root, 'parent', None) is not None:
+        root = root.parent
+
+    return root
+
+
+def addListened(tag, eventType):
+    _root(tag).__dict__.setdefault('_listened', set()).add(eventType)
+
+
+def isListened(tag, eventType):
+    root = _root(tag)
+
+    # Nodes removed from the document keep their listeners but not the
+    # set of listened types
+    if not isinstance(root, BeautifulSoup.BeautifulSoup):
+        return True
+
+    listened = root.__dict__.get('_listened', None)
+    return listened is not None and eventType in listened
+
+
+def mergeListened(parent, node):
+    """
+        Called when the (formerly detached) subtree rooted in `node' is
+        inserted under `parent'.
+
+        The types listened in the subtree may have been recorded in the
+        root of another detached tree `node' was part of, so they are
+        collected from the listeners of the subtree too.
+    """
+    listened = node.__dict__.pop('_listened', None) or set()
+
+    for tag in itertools.chain((node, ), node.descendants):
+        listeners = tag.__dict__.get('_listeners', None) if isinstance(tag, BeautifulSoup.Tag) else None
+        if listeners:
+            listened.update(listeners.types())
+
+    if listened:
+        _root(parent).__dict__.setdefault('_listened', set()).update(listened)
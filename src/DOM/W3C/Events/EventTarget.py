@@ -3,28 +3,37 @@
 from .Event import Event
 from .HTMLEvent import HTMLEvent
 from .MouseEvent import MouseEvent
+from .EventListeners import getListeners, addListened, isListened
+from DOM.Tracing import span
+from DOM.BridgeProfiler import bridge_profiler
 
 import traceback
 import logging
 log = logging.getLogger("Thug")
 
 # Introduced in DOM Level 2
+def attachEvent(self, eventType, handler):
+    return self._attachEvent(eventType, handler)
+
+
+def addEventListener(self, eventType, listener, capture = False):
+    return self._addEventListener(eventType, listener, capture)
+
+
 class EventTarget:
     def __init__(self):
+        # The methods are set on the class the first time one of its
+        # instances is created
         if log.ThugOpts.Personality.isIE() and log.ThugOpts.Personality.browserVersion < '9.0':
             self.detachEvent = self._detachEvent
 
-            def attachEvent(self, eventType, handler):
-                return self._attachEvent(eventType, handler)
-
-            setattr(self.__class__, 'attachEvent', attachEvent)
+            if self.__class__.__dict__.get('attachEvent', None) is not attachEvent:
+                setattr(self.__class__, 'attachEvent', attachEvent)
         else:
             self.removeEventListener = self._removeEventListener
 
-            def addEventListener(self, eventType, listener, capture = False):
-                return self._addEventListener(eventType, listener, capture)
-
-            setattr(self.__class__, 'addEventListener', addEventListener)
+            if self.__class__.__dict__.get('addEventListener', None) is not addEventListener:
+                setattr(self.__class__, 'addEventListener', addEventListener)
 
     def __insert_listener(self, eventType, listener, capture, prio):
         # A document element or other object may have more than one event 
@@ -45,18 +54,15 @@ class EventTarget:
         # appended at the end of the _listener list (addEventListener and 
         # attachEvent) or at the beginning (setting an object property or HTML
         # attribute)
-        if prio:
-            self.tag._listeners.insert(0, (eventType, listener, capture))
-        else:
-            self.tag._listeners.append((eventType, listener, capture))
+        getListeners(self.tag, True).add(eventType, listener, capture, prio)
+        addListened(self.tag, eventType)
 
     def _addEventListener(self, eventType, listener, capture = False, prio = False):
-        log.debug('_addEventListener(%s, \n%r, \n%s)' % (eventType, listener, capture, ))
-        
-        if getattr(self.tag, '_listeners', None) is None:
-            self.tag._listeners = list()
+        log.debug('_addEventListener(%s, \n%r, \n%s)', eventType, listener, capture)
+
+        listeners = getListeners(self.tag)
 
-        if not (eventType, listener, capture) in self.tag._listeners:
+        if listeners is None or not (eventType, listener, capture) in listeners:
             self.__insert_listener(eventType, listener, capture, prio)
             return
 
@@ -67,37 +73,37 @@ class EventTarget:
             self.__insert_listener(eventType, listener, capture, prio)
 
     def _removeEventListener(self, eventType, listener, capture = False):
-        log.debug('_removeEventListener(%s, \n%r, \n%s)' % (eventType, listener, capture, ))
-        
-        try:
-            self.tag._listeners.remove((eventType, listener, capture))
-        except:
-            pass
+        log.debug('_removeEventListener(%s, \n%r, \n%s)', eventType, listener, capture)
+
+        listeners = getListeners(self.tag)
+        if listeners is not None:
+            listeners.remove(eventType, listener, capture)
 
     def _attachEvent(self, eventType, handler, prio = False):
-        log.debug('_attachEvent(%s, \n%r)' % (eventType, handler, ))
+        log.debug('_attachEvent(%s, \n%r)', eventType, handler)
         if not eventType.startswith('on'):
             log.warning('[WARNING] attachEvent eventType: %s', eventType)
 
         self._addEventListener(eventType[2:], handler, False, prio)
 
     def _detachEvent(self, eventType, handler):
-        log.debug('_detachEvent(%s, \n%r)' % (eventType, handler, ))
+        log.debug('_detachEvent(%s, \n%r)', eventType, handler)
         if not eventType.startswith('on'):
             log.warning('[WARNING] detachEvent eventType: %s', eventType)
 
         self._removeEventListener(eventType[2:], handler)
 
     def _get_listeners(self, tag, evtType):
-        _listeners         = [(eventType, listener, capture) for (eventType, listener, capture) in tag._listeners if eventType == evtType]
-        capture_listeners  = [(eventType, listener, capture) for (eventType, listener, capture) in _listeners if capture is True]
-        bubbling_listeners = [(eventType, listener, capture) for (eventType, listener, capture) in _listeners if capture is False]
-        return capture_listeners, bubbling_listeners
+        listeners = getListeners(tag)
+        if listeners is None:
+            return [], []
+
+        return listeners.get(evtType)
 
     def _do_dispatch(self, c, evtObject):
         eventType, listener, capture = c
-            
-        with self.doc.window.context as ctx:
+
+        with self.doc.window._runningScript(), self.doc.window.context as ctx, bridge_profiler.js():
             if log.ThugOpts.Personality.isIE() and log.ThugOpts.Personality.browserVersion < '9.0':
                 self.doc.window.event = evtObject
                 listener()
@@ -117,9 +123,6 @@ class EventTarget:
 
         self._dispatchCaptureEvent(tag.parent, evtType, evtObject)
         
-        if not tag.parent._listeners:
-            return
-
         if evtObject._stoppedPropagation:
             return
 
@@ -133,9 +136,6 @@ class EventTarget:
             if node is None:
                 break
             
-            if not node._listeners:
-                continue
-
             if evtObject._stoppedPropagation:
                 continue
 
@@ -145,36 +145,42 @@ class EventTarget:
                 self.do_dispatch(c, evtObject)
 
     def dispatchEvent(self, evtType):
-        log.info('dispatchEvent(%s)' % (evtType, ))
-        evtObject = None
+        with span('event.dispatch', type = evtType):
+            log.info('dispatchEvent(%s)', evtType)
+
+            # Nobody in the document listens to evtType
+            if not isListened(self.tag, evtType):
+                return True
+
+            evtObject = None
 
-        if evtType in MouseEvent.MouseEventTypes:
-            evtObject = MouseEvent(evtType, self)
+            if evtType in MouseEvent.MouseEventTypes:
+                evtObject = MouseEvent(evtType, self)
 
-        if evtType in HTMLEvent.HTMLEventTypes:
-            evtObject = HTMLEvent(evtType, self)
+            if evtType in HTMLEvent.HTMLEventTypes:
+                evtObject = HTMLEvent(evtType, self)
 
-        #print evtObject
-        capture_listeners, bubbling_listeners = self._get_listeners(self.tag, evtType)
+            #print evtObject
+            capture_listeners, bubbling_listeners = self._get_listeners(self.tag, evtType)
 
-        if capture_listeners:
-            evtObject.eventPhase = Event.CAPTURING_PHASE
-            self._dispatchCaptureEvent(self.tag, evtType, evtObject)
+            if capture_listeners:
+                evtObject.eventPhase = Event.CAPTURING_PHASE
+                self._dispatchCaptureEvent(self.tag, evtType, evtObject)
    
-        evtObject.eventPhase    = Event.AT_TARGET
-        evtObject.currentTarget = self
+            evtObject.eventPhase    = Event.AT_TARGET
+            evtObject.currentTarget = self
 
-        if not evtObject._stoppedPropagation:
-            for c in capture_listeners:
-                self.do_dispatch(c, evtObject)
+            if not evtObject._stoppedPropagation:
+                for c in capture_listeners:
+                    self.do_dispatch(c, evtObject)
 
-            for c in bubbling_listeners:
-                self.do_dispatch(c, evtObject)
+                for c in bubbling_listeners:
+                    self.do_dispatch(c, evtObject)
 
-        if bubbling_listeners:
-            evtObject.eventPhase = Event.BUBBLING_PHASE
-            self._dispatchBubblingEvent(self.tag, evtType, evtObject)
+            if bubbling_listeners:
+                evtObject.eventPhase = Event.BUBBLING_PHASE
+                self._dispatchBubblingEvent(self.tag, evtType, evtObject)
 
-        evtObject.eventPhase = Event.AT_TARGET
-        return True
+            evtObject.eventPhase = Event.AT_TARGET
+            return True
 
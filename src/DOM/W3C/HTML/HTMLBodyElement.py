@@ -2,6 +2,7 @@
 
 from .HTMLElement import HTMLElement
 from .attr_property import attr_property
+from Style.CSS.CSSStyleDeclaration import flushStyles
 
 class HTMLBodyElement(HTMLElement):
     def __init__(self, doc, tag):
@@ -19,8 +20,10 @@ class HTMLBodyElement(HTMLElement):
 
     def __str__(self):
         body = self.doc.find('body')
+        flushStyles(body if body else self.doc)
         return str(body if body else self.doc)
 
     def __unicode__(self):
         body = self.doc.find('body')
+        flushStyles(body if body else self.doc)
         return unicode(body if body else self.doc)
@@ -25,9 +25,14 @@ import PyV8
 
 from Document import Document
 from DOMException import DOMException
+from MutationJournal import recordInsert
+from DocumentIndex import getIndex
+from ParserBackend import parseHTML
+from DOM.Tracing import span
 from .HTMLCollection import HTMLCollection
 from .HTMLElement import HTMLElement
 from .HTMLBodyElement import HTMLBodyElement
+from .HTMLStreamParser import HTMLStreamParser
 from .text_property import text_property
 from .xpath_property import xpath_property
 
@@ -52,6 +57,7 @@ class HTMLDocument(Document):
         self._html          = None
         self._domain        = urlparse(self._win.url).hostname if self._win else ''
         self.current        = None
+        self._writer        = None
 
     def __getattr__(self, attr):
         if self._win and getattr(self._win, "doc", None):
@@ -72,6 +78,13 @@ class HTMLDocument(Document):
     @property
     def body(self):
         tag = self.doc.find('body')
+
+        # The body wrapper is shared with the other ways of reaching the
+        # body tag (see DOMImplementation.createHTMLElement)
+        node = tag.__dict__.get('_node', None) if tag else None
+        if type(node) is HTMLBodyElement:
+            return node
+
         return HTMLBodyElement(self.doc, tag if tag else self.doc)
 
     @property
@@ -115,7 +128,10 @@ class HTMLDocument(Document):
 
     @property
     def documentElement(self):
-        return HTMLElement(self, self.doc.find('html'))
+        from DOMImplementation import DOMImplementation
+
+        tag = self.doc.find('html')
+        return DOMImplementation.createHTMLElement(self, tag) if tag else None
 
     def _querySelectorAll(self):
         pass
@@ -139,38 +155,58 @@ class HTMLDocument(Document):
         self._html.close()
         self._html = None
 
-        self.doc = BeautifulSoup.BeautifulSoup(html, "html5lib")
+        with span('parse.document', length = len(html)):
+            self.doc = parseHTML(html, "html5lib")
+
+        self._writer = None
 
     def write(self, html):
         if self._html:
             self._html.write(html)
             return
 
-        tag    = self.current
-        parent = tag.parent
-        pos    = parent.contents.index(tag) + 1
-
-        soup = BeautifulSoup.BeautifulSoup(html, "html5lib")
-        soup.html.unwrap()
-        soup.head.unwrap()
-        soup.body.unwrap()
-
-        for tag in soup:
-            parent.insert(pos, tag)
-
-            pos += 1
-
-            name = getattr(tag, "name", None)
-            if name in ('script', None):
-                continue
+        with span('document.write', length = len(html)):
+            self._write(html)
+
+    def _write(self, html):
+        # The same parser is used by all the write calls of the document
+        # so partial markup written by a call is completed by the next one.
+        # The insertion point is moved after the current element (the
+        # script being executed) whenever it changes
+        writer = self._writer
+        if writer is None or writer.soup is not self.doc:
+            writer = self._writer = HTMLStreamParser(self.doc, self._inserted)
+
+        if writer.parent is None or writer.anchor is not self.current:
+            if self.current is not None:
+                writer.moveTo(self.current.parent, self.current)
+            else:
+                writer.moveTo(self.doc.body or self.doc)
+
+        with span('parse.fragment', length = len(html)):
+            writer.write(html)
+
+    def _endWrite(self):
+        # A table or select element written without its end tag is parsed
+        # once the script writing it is over (see HTMLStreamParser.end)
+        if self._writer is not None:
+            self._writer.end()
+
+    def _inserted(self, parent, node):
+        recordInsert(parent, node)
+
+        # Scripts are left in the mutation journal and executed by the
+        # DFT once the current element has been handled
+        name = getattr(node, "name", None)
+        if name in ('script', None):
+            return
 
-            try:
-                handler = getattr(self._win.doc.DFT, "handle_%s" % (name, ), None)
-            except:
-                handler = getattr(log.DFT, "handle_%s" % (name, ), None)
+        try:
+            dft = self._win.doc.DFT
+        except:
+            dft = log.DFT
 
-            if handler:
-                handler(tag)
+        dft.do_handle(node, False)
 
     def writeln(self, text):
         self.write(text + "\n")
@@ -183,6 +219,11 @@ class HTMLDocument(Document):
     #    return DOMImplementation.createHTMLElement(self.doc, tag) if tag else None
 
     def getElementsByName(self, elementName):
+        index = getIndex(self.doc)
+        if index:
+            return HTMLCollection(self.doc, lambda: index.memo(('name', elementName),
+                                                               lambda: self.doc.find_all(attrs = {'name': elementName})))
+
         tags = self.doc.find_all(attrs = {'name': elementName})
         
         return HTMLCollection(self.doc, tags)
@@ -15,9 +15,13 @@ import bs4 as BeautifulSoup
 import logging
 
 from Element import Element
+from MutationJournal import recordInsert, recordMutation
+from DOM.Tracing import span
 from Style.CSS.ElementCSSInlineStyle import ElementCSSInlineStyle
+from Style.CSS.CSSStyleDeclaration import flushStyles
 from .attr_property import attr_property
 from .text_property import text_property
+from .HTMLStreamParser import getFragmentParser
 
 log = logging.getLogger("Thug")
 
@@ -29,44 +33,55 @@ class HTMLElement(Element, ElementCSSInlineStyle):
     dir             = attr_property("dir")
     className       = attr_property("class", default = "")
 
+    raw_text_elements = ('script', 'style', 'textarea', 'title', 'xmp', )
+
     def getInnerHTML(self):
         if not self.hasChildNodes():
             return ""
 
         html = StringIO()
 
+        flushStyles(self.tag)
+
         for tag in self.tag.contents:
             html.write(unicode(tag))
 
         return html.getvalue()
 
     def setInnerHTML(self, html):
-        self.tag.clear()
-        soup = BeautifulSoup.BeautifulSoup(html, "html5lib")
+        with span('element.innerHTML', length = len(html)):
+            self._setInnerHTML(html)
 
-        for node in list(soup.head.descendants):
-            self.tag.append(node)
+    def _setInnerHTML(self, html):
+        # The fragment is parsed in a detached element first so the
+        # content is left as it is if the parser fails
+        fragment = BeautifulSoup.Tag(name = self.tag.name)
 
-        for node in list(soup.body.children):
-            self.tag.append(node)
+        # The content of raw text elements is not markup
+        if self.tag.name in self.raw_text_elements:
+            fragment.append(BeautifulSoup.NavigableString(html))
+        else:
+            parser = getFragmentParser(self.tag, getattr(self.doc, 'doc', None))
+            parser.inserted = lambda parent, node: None
+            parser.moveTo(fragment)
 
-        #soup.head.unwrap()
-        #soup.body.unwrap()
-        #soup.html.wrap(self.tag)
-        #self.tag.html.unwrap()
+            with span('parse.fragment', length = len(html)):
+                parser.parseFragment(html)
+
+        self.tag.clear()
+        recordMutation(self.tag)
 
-        for node in self.tag.descendants:
-            name = getattr(node, 'name', None)
-            if not name:
-                continue
+        for node in list(fragment.contents):
+            self.tag.append(node.extract())
+            recordInsert(self.tag, node)
 
-            try:
-                p = getattr(self.doc.window.doc.DFT, 'handle_%s' % (name, ), None)
-            except:
-                p = getattr(log.DFT, 'handle_%s' % (name, ), None)
+        try:
+            dft = self.doc.window.doc.DFT
+        except:
+            dft = log.DFT
 
-            if p:
-                p(node)
+        for node in list(self.tag.descendants):
+            dft.do_handle(node, False)
             
     innerHTML = property(getInnerHTML, setInnerHTML)
 
@@ -5,6 +5,7 @@ import logging
 from .HTMLElement import HTMLElement
 from .attr_property import attr_property
 from .compatibility import *
+from DocumentIndex import recordAttribute
 
 log = logging.getLogger("Thug")
 
@@ -71,6 +72,7 @@ class HTMLObjectElement(HTMLElement):
 
     def setAttribute(self, name, value):
         self.tag[name] = value
+        recordAttribute(self.tag, name)
 
     @property
     def object(self):
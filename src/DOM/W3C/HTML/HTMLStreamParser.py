@@ -0,0 +1,406 @@
+#!/usr/bin/env python
+
+import re
+import bs4 as BeautifulSoup
+import logging
+
+try:
+    from HTMLParser import HTMLParser, HTMLParseError
+except ImportError:
+    from html.parser import HTMLParser
+    HTMLParseError = AssertionError
+
+from MutationJournal import getRoot
+from ParserBackend import parse
+
+log = logging.getLogger("Thug")
+
+
+class HTMLStreamParser(HTMLParser):
+    """
+        Incremental HTML parser building its nodes straight into an
+        existing tree at an insertion point.
+
+        The markup is fed in chunks (i.e. one for each document.write
+        call) and incomplete tokens (i.e. `<scr') are kept until the next
+        chunk completes them. Elements left open by a chunk receive the
+        nodes parsed from the next ones.
+
+        `inserted' is called with (parent, node) once a node inserted at
+        the insertion point is complete (text, comments, void elements
+        and closed elements). At the end of every chunk the elements still
+        open are reported too, but for scripts and styles whose content
+        may not be complete yet. The descendants of a reported element
+        are only reported if they are completed afterwards.
+
+        The markup HTMLParser fails on (i.e. `<![foo[ x ]]>') and all the
+        text following it in the chunk are parsed as a fragment by
+        html5lib instead.
+
+        The tree builder only implements the implied end tags listed below
+        and none of the table (i.e. foster parenting) and select insertion
+        modes. Whole fragments (see parseFragment) holding such elements
+        are parsed by html5lib. So is the markup written from the start of
+        a table or select element to its end tag (see write), which is
+        kept until the end tag is written or the script writing it ends
+        (see end). ThugOpts.parser only applies to whole documents.
+    """
+    # The content of such elements is text. The one of the RCDATA ones
+    # (title and textarea) has its character references decoded
+    CDATA_CONTENT_ELEMENTS = ('script', 'style', 'title', 'textarea', )
+    rcdata_elements        = ('title', 'textarea', )
+
+    # Fragments parsed by html5lib
+    html5lib_elements = re.compile(r'<\s*(table|select|title|textarea)\b', re.I)
+
+    # Start and end tags of the written markup parsed by html5lib
+    table_tags = re.compile(r'<\s*(/?)\s*(table|select)\b[^>]*>', re.I)
+
+    void_elements = frozenset(('area', 'base', 'basefont', 'br', 'col', 'embed', 'frame', 'hr', 'img',
+                               'input', 'isindex', 'keygen', 'link', 'meta', 'param', 'source', 'track', 'wbr', ))
+
+    # Start and end tags of such elements are dropped (the same way
+    # they were unwrapped from the fragments parsed by html5lib)
+    ignored_elements = ('html', 'head', 'body', )
+
+    # Elements an implied end tag is never looked for beyond
+    scoping_elements = ('applet', 'caption', 'html', 'marquee', 'object', 'table', 'td', 'th', 'template', )
+
+    # Elements closed by the start of the ones listed (the innermost open
+    # one and all the elements open inside it) unless one of the scoping
+    # elements is found first
+    implied_end = {
+        'li'     : (('li', ), ('ol', 'ul', ) + scoping_elements),
+        'dt'     : (('dt', 'dd', ), ('dl', ) + scoping_elements),
+        'dd'     : (('dt', 'dd', ), ('dl', ) + scoping_elements),
+        'option' : (('option', ), ('select', 'datalist', 'optgroup', )),
+        'tr'     : (('tr', ), ('table', 'thead', 'tbody', 'tfoot', )),
+        'td'     : (('td', 'th', ), ('tr', 'table', )),
+        'th'     : (('td', 'th', ), ('tr', 'table', )),
+    }
+
+    # Elements whose start closes an open paragraph
+    block_elements = frozenset(('address', 'article', 'aside', 'blockquote', 'center', 'dd', 'details', 'dialog',
+                                'dir', 'div', 'dl', 'dt', 'fieldset', 'figcaption', 'figure', 'footer', 'form',
+                                'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'header', 'hgroup', 'hr', 'li', 'listing',
+                                'main', 'menu', 'nav', 'ol', 'p', 'plaintext', 'pre', 'section', 'summary', 'ul',
+                                'xmp', ))
+
+    def __init__(self, soup, inserted):
+        HTMLParser.__init__(self)
+        self.soup     = soup
+        self.inserted = inserted
+        self.parent   = None
+        self.anchor   = None
+        self.pos      = 0
+        self.last     = None
+        self.open     = list()
+        self.consumed = 0
+        self.pending  = None
+
+    def moveTo(self, parent, after = None):
+        """
+            Moves the insertion point right after the `after' child of
+            `parent' (or at the end of `parent'). The elements still open
+            are left as they are in the tree.
+        """
+        self.end()
+
+        self.parent = parent
+        self.anchor = after
+        self.last   = after
+        self.pos    = self._index(after) + 1 if after is not None else len(parent.contents)
+        self.open   = list()
+
+    def _index(self, node):
+        # Tags compare equal by value so the child is looked up by identity
+        for i, child in enumerate(self.parent.contents):
+            if child is node:
+                return i
+
+        return len(self.parent.contents) - 1
+
+    def _cursor(self):
+        # The document may have been changed (i.e. by appendChild) since
+        # the last insertion so the cursor is checked before being used
+        if self.last is None:
+            self.pos = len(self.parent.contents)
+            return
+
+        if self.pos > len(self.parent.contents) or self.parent.contents[self.pos - 1] is not self.last:
+            self.pos = self._index(self.last) + 1
+
+    def _insert(self, node):
+        if self.open:
+            self.open[-1][0].append(node)
+            return
+
+        self._cursor()
+        self.parent.insert(self.pos, node)
+
+        self.pos += 1
+        if self.last is not None:
+            self.last = node
+
+    def _complete(self, node):
+        if self.open and not self.open[-1][1]:
+            return
+
+        self.inserted(node.parent, node)
+
+    def _close(self, index):
+        while len(self.open) > index:
+            tag, reported = self.open.pop()
+
+            if tag.name in self.rcdata_elements:
+                self._decode(tag)
+
+            if not reported:
+                self._complete(tag)
+
+    def _decode(self, tag):
+        for child in list(tag.contents):
+            if type(child) is BeautifulSoup.NavigableString:
+                child.replace_with(BeautifulSoup.NavigableString(self.unescape(child)))
+
+    def _tag(self, name, attrs):
+        _attrs = dict()
+
+        for attr, value in attrs:
+            if attr not in _attrs:
+                _attrs[attr] = value if value is not None else ""
+
+        return BeautifulSoup.Tag(parser  = self.soup,
+                                 builder = getattr(self.soup, 'builder', None),
+                                 name    = name,
+                                 attrs   = _attrs)
+
+    def updatepos(self, i, j):
+        # Offset of the end of the last token handled in rawdata
+        self.consumed = j
+        return HTMLParser.updatepos(self, i, j)
+
+    def _guard(self, method, *args):
+        self.consumed = 0
+
+        try:
+            method(*args)
+        except HTMLParseError as e:
+            log.warning("[HTMLStreamParser] %s, parsing the rest as a fragment", e)
+
+            # The text the parser failed on would be kept in rawdata and
+            # fed again with every chunk that follows
+            rest = self.rawdata[self.consumed:]
+            self.reset()
+            self._fragment(rest)
+
+    def _feed(self, html):
+        self._guard(self.feed, html)
+
+    def _fragment(self, html):
+        soup = parse(html, "html5lib")
+
+        for name in self.ignored_elements:
+            tag = soup.find(name)
+            if tag:
+                tag.unwrap()
+
+        for node in list(soup.contents):
+            node.extract()
+            self._insert(node)
+            self._complete(node)
+
+    def write(self, html):
+        while html:
+            html = self._write(html)
+
+        self.flush()
+
+    def _write(self, html):
+        # Returns the markup left to write after a table or select element
+        # parsed by html5lib
+        if self.pending is None:
+            start = self._start(html)
+            if start is None:
+                self._feed(html)
+                return None
+
+            self._feed(html[:start])
+
+            # The start tag is text (i.e. the content of a script or of a
+            # comment) if the parser did not consume all the markup before
+            if self.rawdata or self.cdata_elem:
+                self._feed(html[start:])
+                return None
+
+            self.pending = ""
+            html         = html[start:]
+
+        self.pending += html
+
+        end = self._end(self.pending)
+        if end is None:
+            return None
+
+        html, rest   = self.pending[:end], self.pending[end:]
+        self.pending = None
+
+        self._fragment(html)
+        return rest
+
+    def _start(self, html):
+        for m in self.table_tags.finditer(html):
+            if not m.group(1):
+                return m.start()
+
+        return None
+
+    def _end(self, html):
+        # Offset past the end tag closing the first element
+        names = list()
+
+        for m in self.table_tags.finditer(html):
+            name = m.group(2).lower()
+
+            if not m.group(1):
+                names.append(name)
+            elif name in names:
+                del names[len(names) - 1 - names[::-1].index(name):]
+
+                if not names:
+                    return m.end()
+
+        return None
+
+    def end(self):
+        """
+            Parses the table or select element whose end tag was never
+            written, as the script writing it is over.
+        """
+        if self.pending is None:
+            return
+
+        html, self.pending = self.pending, None
+
+        self._fragment(html)
+        self.flush()
+
+    def parseFragment(self, html):
+        """
+            Parses a whole fragment. The elements left open are closed and
+            the parser is ready for the next fragment.
+        """
+        if self.html5lib_elements.search(html):
+            self._fragment(html)
+            return
+
+        try:
+            self._feed(html)
+            self._guard(self.close)
+            self._close(0)
+        finally:
+            self.reset()
+
+    def flush(self):
+        for entry in self.open:
+            tag, reported = entry
+            if reported:
+                continue
+
+            if tag.name in ('script', 'style', ):
+                break
+
+            self.inserted(tag.parent, tag)
+            entry[1] = True
+
+    def handle_starttag(self, name, attrs):
+        if name in self.ignored_elements:
+            return
+
+        if name in self.implied_end:
+            self._implied(*self.implied_end[name])
+
+        if name in self.block_elements:
+            self._implied(('p', ), ('button', ) + self.scoping_elements)
+
+        tag = self._tag(name, attrs)
+        self._insert(tag)
+
+        if name in self.void_elements:
+            self._complete(tag)
+        else:
+            self.open.append([tag, False])
+
+    def _implied(self, names, scope):
+        for index in range(len(self.open) - 1, -1, -1):
+            name = self.open[index][0].name
+
+            if name in names:
+                self._close(index)
+                return
+
+            if name in scope:
+                return
+
+    def handle_startendtag(self, name, attrs):
+        if name in self.ignored_elements:
+            return
+
+        tag = self._tag(name, attrs)
+        self._insert(tag)
+        self._complete(tag)
+
+    def handle_endtag(self, name):
+        if name in self.ignored_elements:
+            return
+
+        for index in range(len(self.open) - 1, -1, -1):
+            if self.open[index][0].name == name:
+                self._close(index)
+                return
+
+    def handle_data(self, data):
+        if not data:
+            return
+
+        # Text split across chunks (i.e. the content of a script) is kept
+        # in a single string
+        if self.open:
+            contents = self.open[-1][0].contents
+            if contents and type(contents[-1]) is BeautifulSoup.NavigableString:
+                contents[-1].replace_with(BeautifulSoup.NavigableString(contents[-1] + data))
+                return
+
+        node = BeautifulSoup.NavigableString(data)
+        self._insert(node)
+        self._complete(node)
+
+    def handle_entityref(self, name):
+        self.handle_data(self.unescape("&%s;" % (name, )))
+
+    def handle_charref(self, name):
+        self.handle_data(self.unescape("&#%s;" % (name, )))
+
+    def handle_comment(self, data):
+        node = BeautifulSoup.Comment(data)
+        self._insert(node)
+        self._complete(node)
+
+
+def getFragmentParser(tag, soup = None):
+    """
+        Returns the parser used for the fragments inserted in the tree of
+        `tag' (see HTMLElement.setInnerHTML). If `tag' is not part of a
+        document the tags are built by the builder of `soup' (the document
+        `tag' was created by).
+    """
+    root   = getRoot(tag)
+    parser = root.__dict__.get('_fragmentParser', None)
+
+    if parser is None:
+        if isinstance(root, BeautifulSoup.BeautifulSoup):
+            soup = root
+
+        parser = root.__dict__['_fragmentParser'] = HTMLStreamParser(soup, None)
+
+    return parser
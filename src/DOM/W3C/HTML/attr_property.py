@@ -1,10 +1,13 @@
 #!/usr/bin/env python
 
+from DocumentIndex import recordAttribute
+
 def attr_property(name, attrtype = str, readonly = False, default = None):
     def getter(self):
         return attrtype(self.tag[name]) if self.tag.has_attr(name) else default
         
     def setter(self, value):
         self.tag[name] = attrtype(value)
+        recordAttribute(self.tag, name)
         
     return property(getter) if readonly else property(getter, setter)
@@ -2,6 +2,8 @@
 
 import bs4 as BeautifulSoup
 
+from MutationJournal import recordMutation
+
 def text_property(readonly = False):
     def getter(self):
         return str(self.tag.string)
@@ -13,6 +15,7 @@ def text_property(readonly = False):
             self.tag.append(text)
                     
         self.tag.string = self.tag.contents[0]
+        recordMutation(self.tag, structural = False)
         
     return property(getter) if readonly else property(getter, setter)
 
@@ -18,6 +18,8 @@ except ImportError:
 
 from .HTMLCollection import HTMLCollection
 from .attr_property import attr_property
+from DocumentIndex import getIndex
+from MutationJournal import recordInsert, recordMutation
 
 def xpath_property(xpath, readonly = False):
     RE_INDEXED = re.compile("(\w+)\[([^\]]+)\]")
@@ -47,7 +49,11 @@ def xpath_property(xpath, readonly = False):
 
         children = []
 
-        tags = tag.find_all(name, recursive = recursive)
+        index = getIndex(tag) if recursive and tag.parent is None else None
+        if index:
+            tags = index.getElementsByTagName(name)
+        else:
+            tags = tag.find_all(name, recursive = recursive)
 
         if idx:
             if idx[0] == '@':
@@ -60,8 +66,16 @@ def xpath_property(xpath, readonly = False):
             
         return children
         
+    def getChildrenIndexed(doc):
+        # Text nodes are changed without any mutation being recorded
+        index = getIndex(doc) if parts[-1] != 'text()' else None
+        if index is None:
+            return getChildren(doc, parts)
+
+        return index.memo(('xpath', xpath), lambda: getChildren(doc, parts))
+
     def getter(self):
-        children = getChildren(self.doc, parts)
+        children = getChildrenIndexed(self.doc)
 
         if xpath == '/html/body[1]' and not children:
             children = [self.doc]
@@ -79,7 +93,11 @@ def xpath_property(xpath, readonly = False):
                 return DOMImplementation.createHTMLElement(self.doc, children[0]) if len(children) > 0 else None
             except ValueError: 
                 pass
-                
+
+        if getIndex(self.doc):
+            doc = self.doc
+            return HTMLCollection(doc, lambda: getChildrenIndexed(doc))
+
         return HTMLCollection(self.doc, children)
         
     def setter(self, value):
@@ -94,6 +112,8 @@ def xpath_property(xpath, readonly = False):
                 else:
                     tag.append(value)                    
                     tag.string = tag.contents[0]
+
+                recordMutation(tag, structural = False)
                 return
             else:
                 child = tag.find(part)
@@ -102,10 +122,12 @@ def xpath_property(xpath, readonly = False):
                     child = BeautifulSoup.Tag(parser = self.doc, name = part)
                     
                     tag.append(child)
+                    recordInsert(tag, child)
                     
                 tag = child
                 
         tag.append(value)
+        recordInsert(tag, tag.contents[-1])
 
     return property(getter) if readonly else property(getter, setter)
 
@@ -0,0 +1,109 @@
+#!/usr/bin/env python
+
+import bs4 as BeautifulSoup
+
+from Events.EventListeners import mergeListened
+
+
+class MutationJournal(object):
+    # The journal keeps track of the nodes inserted in a document since the
+    # last time it was drained so the DFT only needs to visit those nodes
+    # instead of comparing the whole tree before and after each handled
+    # element. It is filled by HTMLDocument.write, HTMLElement.setInnerHTML
+    # and the Node insertion methods.
+    #
+    # The generation counter is bumped on every mutation (insertions,
+    # removals, attribute and text changes) and is used for telling
+    # whether the computed styles are still valid. The structure counter
+    # is bumped only by the mutations which may change the result of a
+    # document query (insertions, removals and changes of the attributes
+    # the queries look at) and is used for telling whether the document
+    # indexes and the live collections are still valid.
+    def __init__(self):
+        self.inserted   = list()
+        self.generation = 0
+        self.structure  = 0
+
+    def __len__(self):
+        return len(self.inserted)
+
+    def insert(self, node):
+        self.generation += 1
+        self.structure  += 1
+
+        if isinstance(node, BeautifulSoup.Tag):
+            self.inserted.append(node)
+
+    def drain(self):
+        inserted      = self.inserted
+        self.inserted = list()
+
+        for node in inserted:
+            yield node
+
+            for child in node.descendants:
+                if isinstance(child, BeautifulSoup.Tag):
+                    yield child
+
+
+def getRoot(tag):
+    root = tag
+
+    while getattr(root, 'parent', None) is not None:
+        root = root.parent
+
+    return root
+
+
+def getJournal(tag):
+    root = getRoot(tag)
+
+    # Detached subtrees are not journaled. Their nodes are recorded when
+    # the subtree itself is inserted in the document
+    if not isinstance(root, BeautifulSoup.BeautifulSoup):
+        return None
+
+    journal = root.__dict__.get('_journal', None)
+    if journal is None:
+        journal = MutationJournal()
+        root.__dict__['_journal'] = journal
+
+    return journal
+
+
+def recordInsert(parent, node):
+    # Event types listened in a formerly detached subtree
+    if isinstance(node, BeautifulSoup.Tag):
+        mergeListened(parent, node)
+
+    journal = getJournal(parent)
+    if journal is None:
+        return
+
+    journal.insert(node)
+
+    # Keep the document index (see DocumentIndex) up to date
+    index = getRoot(parent).__dict__.get('_index', None)
+    if index is not None:
+        index.add(node)
+
+
+def recordMutation(tag, structural = True):
+    journal = getJournal(tag)
+    if journal is None:
+        return
+
+    journal.generation += 1
+
+    if structural:
+        journal.structure += 1
+
+
+def getGeneration(tag):
+    journal = getJournal(tag)
+    return journal.generation if journal is not None else None
+
+
+def getStructure(tag):
+    journal = getJournal(tag)
+    return journal.structure if journal is not None else None
@@ -2,6 +2,8 @@
 
 import PyV8
 
+from DocumentIndex import recordAttribute
+
 class NamedNodeMap(PyV8.JSClass):
     def __init__(self, parent):
         self.parent = parent
@@ -18,6 +20,7 @@ class NamedNodeMap(PyV8.JSClass):
         attr.parent = self.parent
 
         self.parent.tag[attr.name] = attr.value
+        recordAttribute(self.parent.tag, attr.name)
 
         if oldattr:
             oldattr.parent = None
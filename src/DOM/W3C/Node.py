@@ -10,6 +10,8 @@ from abstractmethod import abstractmethod
 from DOMException import DOMException
 from Events.EventTarget import EventTarget
 from NodeList import NodeList
+from MutationJournal import recordInsert, recordMutation
+from Events.EventListeners import mergeListened
 
 log = logging.getLogger("Thug")
 
@@ -221,12 +223,15 @@ class Node(PyV8.JSClass, EventTarget):
             return newChild
 
         if newChild.nodeType in (Node.DOCUMENT_FRAGMENT_NODE, ):
+            mergeListened(self.tag, newChild.tag)
+
             # self.tag.insert(index, newChild.tag.findChild())
             node = None
 
             for p in newChild.tag.find_all_next():
                 if node is None:
                     self.tag.insert(index, p)
+                    recordInsert(self.tag, p)
                 else:
                     node.append(p)
 
@@ -235,6 +240,7 @@ class Node(PyV8.JSClass, EventTarget):
             return newChild
 
         self.tag.insert(index, newChild.tag)
+        recordInsert(self.tag, newChild.tag)
         return newChild
 
     def replaceChild(self, newChild, oldChild):
@@ -258,17 +264,23 @@ class Node(PyV8.JSClass, EventTarget):
         if index < 0 and not self.is_text(refChild):
             raise DOMException(DOMException.NOT_FOUND_ERR)
 
+        # The replaced node is detached through replace_with so it does not
+        # linger in the document indexes
         if self.is_text(newChild):
-            self.tag.contents[index] = newChild.data.output_ready(formatter = lambda x: x)
+            self.tag.contents[index].replace_with(BeautifulSoup.NavigableString(newChild.data.output_ready(formatter = lambda x: x)))
+            recordMutation(self.tag)
             return oldChild
 
         if newChild.nodeType in (Node.DOCUMENT_FRAGMENT_NODE, ):
+            mergeListened(self.tag, newChild.tag)
+
             #self.tag.contents[index] = newChild.tag.findChild()
             node = None
 
             for p in newChild.tag.find_all_next():
                 if node is None:
-                    self.tag.contents[index] = p
+                    self.tag.contents[index].replace_with(p)
+                    recordInsert(self.tag, p)
                 else:
                     node.append(p)
 
@@ -276,7 +288,8 @@ class Node(PyV8.JSClass, EventTarget):
 
             return oldChild
 
-        self.tag.contents[index] = newChild.tag
+        self.tag.contents[index].replace_with(newChild.tag)
+        recordInsert(self.tag, newChild.tag)
         return oldChild
 
     def removeChild(self, oldChild):
@@ -305,6 +318,8 @@ class Node(PyV8.JSClass, EventTarget):
                     p.extract()
             #self.tag.contents.remove(oldChild.tag)
 
+            recordMutation(self.tag)
+
         return oldChild
 
     def appendChild(self, newChild):
@@ -338,15 +353,21 @@ class Node(PyV8.JSClass, EventTarget):
             return newChild
 
         if newChild.nodeType in (Node.DOCUMENT_FRAGMENT_NODE, ):
+            mergeListened(self.tag, newChild.tag)
+
             #self.tag.append(newChild.tag.findChild())
             node = self.tag
             for p in newChild.tag.find_all_next():
                 node.append(p)
                 node = p
 
+            if node is not self.tag:
+                recordInsert(self.tag, self.tag.contents[-1])
+
             return newChild
 
         self.tag.append(newChild.tag)
+        recordInsert(self.tag, newChild.tag)
         return newChild
 
     def hasChildNodes(self):
@@ -401,16 +422,32 @@ class Node(PyV8.JSClass, EventTarget):
 
         if obj is None:
             return None
+
+        # Wrappers are cached on the wrapped object so the same object is
+        # returned every time
+        node = obj.__dict__.get('_node', None)
         
         if type(obj) == BeautifulSoup.CData:
             from CDATASection import CDATASection
 
-            return CDATASection(doc, obj)
+            if type(node) is not CDATASection:
+                node = obj.__dict__['_node'] = CDATASection(doc, obj)
+
+            return node
         
         if type(obj) == BeautifulSoup.NavigableString:
             from Text import Text
 
-            return Text(doc, obj)        
+            if type(node) is not Text:
+                node = obj.__dict__['_node'] = Text(doc, obj)
+
+            return node
+
+        # Tags get the wrapper of their own class, the same one returned
+        # by getElementById and the collections
+        if isinstance(obj, BeautifulSoup.Tag) and not isinstance(obj, BeautifulSoup.BeautifulSoup):
+            from DOMImplementation import DOMImplementation
+            return DOMImplementation.createHTMLElement(doc, obj)
        
-        return Element(doc, obj)
+        return node if isinstance(node, Element) else Element(doc, obj)
 
@@ -8,6 +8,16 @@ class NodeList(PyV8.JSClass):
         self.doc = doc
         self.nodes = nodes
 
+    # Live node lists are built around a callable returning the current
+    # nodes (see DocumentIndex)
+    def getNodes(self):
+        return self._nodes() if callable(self._nodes) else self._nodes
+
+    def setNodes(self, nodes):
+        self._nodes = nodes
+
+    nodes = property(getNodes, setNodes)
+
     def __len__(self):
         return self.length
 
@@ -0,0 +1,80 @@
+#!/usr/bin/env python
+
+import re
+import logging
+import collections
+import bs4 as BeautifulSoup
+
+log = logging.getLogger("Thug")
+
+# Backends selectable through ThugOpts.parser:
+#
+#   html.parser     the Python standard library parser
+#   lxml            libxml2 based parser (fast, optional)
+#   html5lib        HTML5 compliant parser (slow, closest to the browsers)
+#   auto            lxml, but html5lib is used whenever the tree built by
+#                   lxml lost or added elements compared to the markup
+#
+# If no backend is chosen every caller keeps its own default.
+backends = ('html.parser', 'lxml', 'html5lib', 'auto', )
+
+# The elements implied (or dropped) by the parsers and the raw text
+# elements whose content is not markup
+_implied  = ('html', 'head', 'body', 'tbody', )
+_raw_text = re.compile(r'<!--.*?-->|<(script|style|textarea|title|xmp)\b[^>]*>.*?</\1\s*>', re.I | re.S)
+_start    = re.compile(r'<([a-zA-Z][a-zA-Z0-9:_-]*)')
+
+_missing  = set()
+
+
+def available(backend):
+    return BeautifulSoup.builder_registry.lookup(backend) is not None
+
+
+def _parse(html, backend):
+    if not available(backend):
+        if backend not in _missing:
+            log.warning("[ParserBackend] %s is not available, falling back to html5lib", backend)
+            _missing.add(backend)
+
+        backend = 'html5lib'
+
+    return BeautifulSoup.BeautifulSoup(html, backend)
+
+
+def _tags(html):
+    # The raw text elements are counted but not their content
+    html = _raw_text.sub(lambda m: '<%s>' % (m.group(1), ) if m.group(1) else '', html)
+
+    return collections.Counter(name.lower() for name in _start.findall(html) if name.lower() not in _implied)
+
+
+def consistent(html, soup):
+    """
+        Tells whether `soup' has exactly the elements found in the markup
+        (but for the implied ones).
+    """
+    return _tags(html) == collections.Counter(tag.name for tag in soup.find_all(True) if tag.name not in _implied)
+
+
+def parse(html, backend):
+    if backend not in ('auto', ):
+        return _parse(html, backend)
+
+    if available('lxml'):
+        soup = BeautifulSoup.BeautifulSoup(html, 'lxml')
+        if consistent(html, soup):
+            return soup
+
+        log.debug("[ParserBackend] lxml tree differs from the markup, using html5lib")
+
+    return BeautifulSoup.BeautifulSoup(html, 'html5lib')
+
+
+def parseHTML(html, default = 'html.parser'):
+    """
+        Parses `html' with the backend chosen through ThugOpts.parser or
+        with `default' if no backend was chosen.
+    """
+    opts = getattr(log, 'ThugOpts', None)
+    return parse(html, getattr(opts, 'parser', None) or default)
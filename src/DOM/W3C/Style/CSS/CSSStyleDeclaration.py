@@ -1,33 +1,116 @@
 #!/usr/bin/env python
 
+import re
+
+import bs4 as BeautifulSoup
+
+from MutationJournal import recordMutation
+
+
 class CSSStyleDeclaration(object):
-    def __init__(self, style):
+    # Attributes which are not style properties
+    internals = ('props', '_owner', '_text', '_source', '_invalid', '_dirty', )
+
+    # JS property names (i.e. backgroundColor) are mapped to the CSS ones
+    # (i.e. background-color)
+    _camel = re.compile(r'([A-Z])')
+
+    # Semicolons within parentheses (i.e. url(data:...;base64,...)) do not
+    # end a declaration
+    _separator = re.compile(r';(?![^(]*\))')
+
+    def __init__(self, style, owner = None):
+        # The declaration of the inline style of an element (the `owner'
+        # tag) is marked dirty by the property writes and serialized back
+        # to the style attribute only when the attribute is read (see
+        # flushStyle)
+        object.__setattr__(self, '_owner', owner)
+        object.__setattr__(self, '_dirty', False)
+        object.__setattr__(self, '_source', style)
+        self._parse(style)
+
+    def _parse(self, style):
         #self.props = dict([prop.strip().split(': ') for prop in style.split(';') if prop])
-        self.props = dict()
+        props   = dict()
+        invalid = list()
 
-        for prop in [p for p in style.split(';') if p]:
-            try:
-                k, v = prop.strip().split(':')
-            except ValueError:
+        for prop in [p.strip() for p in self._separator.split(style) if p.strip()]:
+            # Values may hold colons (i.e. url(http://...))
+            k, sep, v = prop.partition(':')
+
+            # Declarations which cannot be parsed are kept as they are
+            if not sep or not k.strip():
+                invalid.append(prop)
                 continue
-            self.props[k.strip()] = v.strip()
-         
-        for k, v in self.props.items():
+
+            props[k.strip()] = v.strip()
+
+        for k, v in props.items():
             if v and v[0] == v[-1] and v[0] in ['"', "'"]:
-                self.props[k] = v[1:-1]
+                props[k] = v[1:-1]
+
+        object.__setattr__(self, 'props', props)
+        object.__setattr__(self, '_invalid', invalid)
+        object.__setattr__(self, '_text', None)
+
+    def _update(self):
+        object.__setattr__(self, '_text', None)
+
+        owner = object.__getattribute__(self, '_owner')
+        if owner is None or object.__getattribute__(self, '_dirty'):
+            return
+
+        # The computed styles are invalidated once, when the declaration
+        # gets dirty. The style attribute is not one of the structural
+        # ones so the document indexes are kept
+        object.__setattr__(self, '_dirty', True)
+        recordMutation(owner, structural = False)
+
+    def _flush(self):
+        if not object.__getattribute__(self, '_dirty'):
+            return
+
+        object.__setattr__(self, '_dirty', False)
+
+        # The style attribute was set (i.e. by setAttribute) after the
+        # changes and wins over them (ElementCSSInlineStyle.getStyle will
+        # parse it again)
+        owner = object.__getattribute__(self, '_owner')
+        if owner.get('style', '') != object.__getattribute__(self, '_source'):
+            return
+
+        owner['style'] = self.cssText
+        object.__setattr__(self, '_source', owner['style'])
+
+    def _name(self, name):
+        if name in ('cssFloat', 'styleFloat', ):
+            return 'float'
+
+        return self._camel.sub(lambda m: '-' + m.group(1).lower(), name)
 
     @property
     def cssText(self):
-        return '; '.join(["%s: %s" % (k, v) for k, v in self.props.items()])
+        # Serialized again only after a change
+        text = object.__getattribute__(self, '_text')
+        if text is None:
+            text = '; '.join(["%s: %s" % (k, v) for k, v in self.props.items()] + self._invalid)
+            object.__setattr__(self, '_text', text)
+
+        return text
 
     def getPropertyValue(self, name):
         return self.props.get(name, '')
 
+    def setProperty(self, name, value, priority = ''):
+        self.props[name] = value
+        self._update()
+
     def removeProperty(self, name):
         v = self.props.get(name, '')
 
         if v:
             del self.props[name]
+            self._update()
 
         return v
 
@@ -48,10 +131,43 @@ class CSSStyleDeclaration(object):
         if hasattr(object, name):
             return object.__getattribute__(self, name)
         else:
-            return object.__getattribute__(self, 'props').get(name, '')
+            props = object.__getattribute__(self, 'props')
+            return props.get(name, None) or props.get(self._name(name), '')
 
     def __setattr__(self, name, value):
-        if name == 'props':
+        if name in self.internals:
             object.__setattr__(self, name, value)
+            return
+
+        if name in ('cssText', ):
+            self._parse(value)
         else:
-            object.__getattribute__(self, 'props')[name] = value
+            props = object.__getattribute__(self, 'props')
+            props.pop(name, None)
+
+            if value in ('', None, ):
+                props.pop(self._name(name), None)
+            else:
+                props[self._name(name)] = value
+
+        self._update()
+
+
+def flushStyle(tag):
+    # Writes the pending changes of the inline style of the tag (if any)
+    # to its style attribute
+    style = tag.__dict__.get('_style', None)
+    if style is not None:
+        style._flush()
+
+
+def flushStyles(tag):
+    # Same as flushStyle for a whole subtree, before it is serialized
+    if not isinstance(tag, BeautifulSoup.Tag):
+        return
+
+    flushStyle(tag)
+
+    for child in tag.descendants:
+        if isinstance(child, BeautifulSoup.Tag):
+            flushStyle(child)
@@ -7,6 +7,18 @@ class ElementCSSInlineStyle(object):
         self.doc = doc
         self.tag = tag
 
-    @property
-    def style(self):
-        return CSSStyleDeclaration(self.tag['style'] if self.tag.has_attr('style') else '')
+    def getStyle(self):
+        text  = self.tag['style'] if self.tag.has_attr('style') else ''
+        style = self.tag.__dict__.get('_style', None)
+
+        # The declaration is cached on the tag and parsed again only if
+        # the style attribute was changed (i.e. by setAttribute) since
+        if style is None or style._source != text:
+            style = self.tag.__dict__['_style'] = CSSStyleDeclaration(text, self.tag)
+
+        return style
+
+    def setStyle(self, text):
+        self.getStyle().cssText = text
+
+    style = property(getStyle, setStyle)
@@ -0,0 +1,330 @@
+#!/usr/bin/env python
+
+import re
+import logging
+import hashlib
+import threading
+import collections
+import bs4 as BeautifulSoup
+
+# soupsieve is the CSS selector engine of recent bs4 releases. Without
+# it there is no style engine and getStyleEngine() returns None
+try:
+    import soupsieve
+except ImportError:
+    soupsieve = None
+
+from cssutils.parse import CSSParser
+
+from MutationJournal import getRoot, getGeneration
+from DocumentIndex import getIndex
+from .CSSStyleDeclaration import CSSStyleDeclaration, flushStyle
+
+log = logging.getLogger("Thug")
+
+
+class Rule(object):
+    __slots__ = ('selector', 'matcher', 'specificity', 'order', 'declarations', 'key', )
+
+    def __init__(self, selector, matcher, specificity, order, declarations, key):
+        self.selector     = selector
+        self.matcher      = matcher
+        self.specificity  = specificity
+        self.order        = order
+        self.declarations = declarations
+        self.key          = key
+
+
+class StyleSheetCache(object):
+    """
+        Process-wide cache of the parsed stylesheets keyed by the SHA-1 of
+        their text.
+
+        Each stylesheet is turned into a list of rules, one for each
+        selector of its style rules (and of the style rules of its @media
+        screen/all rules), with the selector compiled once.
+    """
+    maxsize = 256
+
+    def __init__(self):
+        self.lock    = threading.Lock()
+        self.entries = collections.OrderedDict()
+
+    def key(self, text):
+        if isinstance(text, unicode):
+            text = text.encode('utf-8')
+
+        return hashlib.sha1(text).hexdigest()
+
+    def get(self, text):
+        key = self.key(text)
+
+        with self.lock:
+            rules = self.entries.pop(key, None)
+            if rules is not None:
+                self.entries[key] = rules
+                return rules
+
+        rules = self.parse(text)
+
+        with self.lock:
+            self.entries[key] = rules
+
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last = False)
+
+        return rules
+
+    def _style_rules(self, sheet):
+        for rule in sheet:
+            if rule.type == rule.STYLE_RULE:
+                yield rule
+            elif rule.type == rule.MEDIA_RULE:
+                media = rule.media.mediaText.lower()
+                if not media or 'all' in media or 'screen' in media:
+                    for _rule in rule.cssRules:
+                        if _rule.type == _rule.STYLE_RULE:
+                            yield _rule
+
+    def parse(self, text):
+        cssparser = CSSParser(loglevel = logging.CRITICAL, validate = False)
+
+        try:
+            sheet = cssparser.parseString(text)
+        except:
+            return []
+
+        rules = list()
+
+        for rule in self._style_rules(sheet):
+            declarations = dict((p.name.lower(), (p.value, p.priority.lower() in ('important', ))) for p in rule.style)
+            if not declarations:
+                continue
+
+            for selector in rule.selectorList:
+                # Pseudo-elements never match an element
+                if '::' in selector.selectorText or ':before' in selector.selectorText or ':after' in selector.selectorText:
+                    continue
+
+                try:
+                    matcher = soupsieve.compile(selector.selectorText)
+                except:
+                    continue
+
+                rules.append(Rule(selector.selectorText,
+                                  matcher,
+                                  selector.specificity,
+                                  len(rules),
+                                  declarations,
+                                  selectorKey(selector.selectorText)))
+
+        return rules
+
+
+sheet_cache = StyleSheetCache()
+
+_combinators = re.compile(r'\s*[\s>+~]\s*(?![^\[]*\])(?![^(]*\))')
+_id          = re.compile(r'#(-?[_a-zA-Z][_a-zA-Z0-9-]*)')
+_class       = re.compile(r'\.(-?[_a-zA-Z][_a-zA-Z0-9-]*)')
+_tag         = re.compile(r'^([a-zA-Z][a-zA-Z0-9-]*)')
+
+
+def selectorKey(selector):
+    """
+        Returns the index key of a selector, built on its rightmost
+        compound selector: ('id', value), ('class', value), ('tag', name)
+        or ('*', ) if none of them is there.
+    """
+    compound = _combinators.split(selector.strip())[-1]
+
+    # Attribute selectors may hold `#' and `.'
+    simple = re.sub(r'\[[^\]]*\]|\([^)]*\)', '', compound)
+
+    m = _id.search(simple)
+    if m:
+        return ('id', m.group(1))
+
+    m = _class.search(simple)
+    if m:
+        return ('class', m.group(1))
+
+    m = _tag.match(simple)
+    if m:
+        return ('tag', m.group(1).lower())
+
+    return ('*', )
+
+
+class StyleEngine(object):
+    """
+        Computes the style of the elements of a document.
+
+        The rules of the document stylesheets (the <style> elements) are
+        indexed by the rightmost compound selector, so only the rules whose
+        id, class, tag name or universal key matches the element are
+        tested. The rule index is built again only if the stylesheets text
+        changed. The computed styles are memoised per element and dropped
+        whenever the generation of the document mutation journal changes
+        (i.e. on class, id and style attribute changes).
+
+        The external stylesheets (<link rel="stylesheet">) are not part of
+        the cascade yet.
+    """
+    # Inherited properties
+    inherited = frozenset(('color', 'cursor', 'direction', 'font', 'font-family', 'font-size', 'font-style',
+                           'font-variant', 'font-weight', 'letter-spacing', 'line-height', 'list-style',
+                           'list-style-image', 'list-style-position', 'list-style-type', 'quotes',
+                           'text-align', 'text-indent', 'text-transform', 'visibility', 'white-space',
+                           'word-spacing', ))
+
+    # User agent defaults of the `display' property (`inline' otherwise)
+    display = {
+        'none'       : ('head', 'script', 'style', 'title', 'meta', 'link', 'base', 'template', 'noscript', 'param', ),
+        'block'      : ('html', 'body', 'div', 'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'dl', 'dd', 'dt',
+                        'form', 'fieldset', 'pre', 'blockquote', 'address', 'center', 'hr', 'header', 'footer',
+                        'section', 'article', 'aside', 'nav', 'menu', 'dir', 'legend', 'frameset', 'frame', ),
+        'list-item'  : ('li', ),
+        'table'      : ('table', ),
+        'table-row'  : ('tr', ),
+        'table-cell' : ('td', 'th', ),
+        'table-row-group'    : ('tbody', ),
+        'table-header-group' : ('thead', ),
+        'table-footer-group' : ('tfoot', ),
+        'table-caption'      : ('caption', ),
+    }
+
+    defaults = dict((name, display) for display, names in display.items() for name in names)
+
+    def __init__(self, root):
+        self.root       = root
+        self.sheets     = None
+        self.rules      = dict()
+        self.generation = None
+        self.computed   = dict()
+
+    def _stylesheets(self):
+        index = getIndex(self.root)
+        tags  = index.getElementsByTagName('style') if index else self.root.find_all('style')
+
+        # get_text() skips the Stylesheet strings
+        return [u''.join(s for s in tag.contents if isinstance(s, BeautifulSoup.NavigableString)) for tag in tags]
+
+    def _build(self):
+        sheets = self._stylesheets()
+        if sheets == self.sheets:
+            return
+
+        rules = dict()
+        order = 0
+
+        for text in sheets:
+            for rule in sheet_cache.get(text):
+                rules.setdefault(rule.key, list()).append((order, rule))
+                order += 1
+
+        self.sheets = sheets
+        self.rules  = rules
+
+    def _refresh(self):
+        generation = getGeneration(self.root)
+        if generation is not None and generation == self.generation:
+            return
+
+        self._build()
+        self.computed   = dict()
+        self.generation = generation
+
+    def _candidates(self, tag):
+        keys = [('*', ), ('tag', tag.name.lower())]
+
+        if tag.has_attr('id'):
+            keys.append(('id', tag['id']))
+
+        tokens = tag.get('class', ())
+        if isinstance(tokens, basestring):
+            tokens = tokens.split()
+
+        for token in tokens:
+            keys.append(('class', token))
+
+        for key in keys:
+            for candidate in self.rules.get(key, ()):
+                yield candidate
+
+    def _cascade(self, tag):
+        normal    = list()
+        important = list()
+
+        for order, rule in self._candidates(tag):
+            try:
+                if not rule.matcher.match(tag):
+                    continue
+            except:
+                continue
+
+            for name, (value, _important) in rule.declarations.items():
+                (important if _important else normal).append((rule.specificity, order, name, value))
+
+        style = dict()
+
+        for specificity, order, name, value in sorted(normal):
+            style[name] = value
+
+        # The inline style wins over every rule but the important ones
+        flushStyle(tag)
+
+        if tag.has_attr('style'):
+            style.update(CSSStyleDeclaration(tag['style']).props)
+
+        for specificity, order, name, value in sorted(important):
+            style[name] = value
+
+        return style
+
+    def computeStyle(self, tag):
+        """
+            Returns the computed style of `tag' as a dictionary.
+        """
+        self._refresh()
+
+        entry = self.computed.get(id(tag), None)
+        if entry is not None and entry[0] is tag:
+            return entry[1]
+
+        style = self._cascade(tag)
+
+        parent = tag.parent
+        if isinstance(parent, BeautifulSoup.Tag) and not isinstance(parent, BeautifulSoup.BeautifulSoup):
+            for name, value in self.computeStyle(parent).items():
+                if name in self.inherited and name not in style:
+                    style[name] = value
+
+        if 'display' not in style:
+            style['display'] = self.defaults.get(tag.name.lower(), 'inline')
+
+            if tag.name.lower() in ('input', ) and tag.get('type', '').lower() in ('hidden', ):
+                style['display'] = 'none'
+
+        style.setdefault('visibility', 'visible')
+
+        # Tags are kept referenced so their id is not reused
+        self.computed[id(tag)] = (tag, style)
+        return style
+
+    def getComputedStyle(self, tag):
+        declaration = CSSStyleDeclaration('')
+        declaration.props.update(self.computeStyle(tag))
+        return declaration
+
+
+def getStyleEngine(tag):
+    if soupsieve is None:
+        return None
+
+    root   = getRoot(tag)
+    engine = root.__dict__.get('_styleEngine', None)
+
+    if engine is None:
+        engine = root.__dict__['_styleEngine'] = StyleEngine(root)
+
+    return engine
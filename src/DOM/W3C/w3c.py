@@ -8,12 +8,17 @@ import site
 
 import bs4 as BeautifulSoup
 from .DOMImplementation import DOMImplementation
+from .ParserBackend import backends, parseHTML
+from DOM.Tracing import span
 
 def getDOMImplementation(dom = None, **kwds):
     return DOMImplementation(dom if dom else BeautifulSoup.BeautifulSoup(), **kwds)
     
 def parseString(html, **kwds):
-    return DOMImplementation(BeautifulSoup.BeautifulSoup(html, "html.parser"), **kwds)
+    with span('parse.document', length = len(html)):
+        soup = parseHTML(html, "html.parser")
+
+    return DOMImplementation(soup, **kwds)
     
 def parse(file, **kwds):
     if isinstance(file, StringTypes):
@@ -28,6 +33,7 @@ from .DOMException import DOMException
 from .Node import Node
 from .HTML.HTMLFormElement import HTMLFormElement
 from .Style.CSS.CSSStyleDeclaration import CSSStyleDeclaration
+from .Style.CSS.StyleEngine import getStyleEngine
 
 TEST_HTML = """
 <!DOCTYPE html PUBLIC "-//W3C//DTD XHTML 1.0 Transitional//EN"
@@ -108,8 +114,42 @@ class DocumentTest(unittest.TestCase):
         
         body = nodes.item(0)
         self.assertRaises(DOMException, self.doc.createEvent, 'foo')
-        self.assertEquals("BODY", body.tagName)   
-    
+        self.assertEquals("BODY", body.tagName)
+
+    def testGetElementById(self):
+        p = self.doc.getElementById('hello')
+
+        self.assert_(p)
+
+        p.setAttribute('id', 'world')
+
+        self.failIf(self.doc.getElementById('hello'))
+        self.assertEquals(p, self.doc.getElementById('world'))
+
+        p.removeAttribute('id')
+
+        self.failIf(self.doc.getElementById('world'))
+
+        p.setAttribute('id', 'hello')
+
+        self.assertEquals(p, self.doc.getElementById('hello'))
+
+    def testWrapper(self):
+        html = self.doc.documentElement
+        body = self.doc.getElementsByTagName('body')[0]
+
+        self.assert_(html.firstChild is html.firstChild)
+        self.assert_(html is body.parentNode)
+        self.assert_(body is self.doc.getElementById('hello').parentNode)
+
+        head = self.doc.getElementsByTagName('title')[0].parentNode
+        head.expando = 'head'
+        head.setAttribute('id', 'head')
+
+        self.assert_(head is self.doc.getElementById('head'))
+        self.assertEquals('head', self.doc.getElementById('head').expando)
+        self.assertEquals('HEAD', head.tagName)
+
     def testDocumentType(self):
         doctype = self.doc.doctype
         
@@ -337,6 +377,57 @@ class HTMLDocumentTest(unittest.TestCase):
         self.assertEquals(1, len(self.doc.links))
         self.assertEquals(1, len(self.doc.anchors))
 
+    def testLiveCollections(self):
+        body  = self.doc.body
+        nodes = self.doc.getElementsByTagName('p')
+        paras = body.getElementsByTagName('p')
+        links = self.doc.links
+
+        self.assertEquals(1, nodes.length)
+        self.assertEquals(1, paras.length)
+        self.assertEquals(1, links.length)
+
+        body.appendChild(self.doc.createElement('p'))
+
+        self.assertEquals(2, nodes.length)
+        self.assertEquals(2, paras.length)
+
+        a = self.doc.createElement('a')
+        body.appendChild(a)
+
+        self.assertEquals(1, links.length)
+
+        a.setAttribute('href', '#foo')
+
+        self.assertEquals(2, links.length)
+
+        a.style.color = 'red'
+
+        self.assertEquals(2, nodes.length)
+        self.assertEquals(2, links.length)
+
+    def testStyleAttribute(self):
+        p = self.doc.createElement('p')
+        self.doc.body.appendChild(p)
+
+        p.style.color = 'red'
+        p.style.fontSize = '10px'
+
+        self.failIf(p.tag.has_attr('style'))
+        self.assert_(p.hasAttribute('style'))
+        self.assert_('color: red' in p.getAttribute('style'))
+        self.assert_('font-size: 10px' in p.getAttribute('style'))
+
+        p.style.color = 'blue'
+
+        self.assert_('color: blue' in p.style.cssText)
+        self.assert_('color: blue' in str(self.doc.body))
+
+        p.setAttribute('style', 'width: auto')
+
+        self.assertEquals('width: auto', p.getAttribute('style'))
+        self.assertEquals('', p.style.color)
+
     def testWrite(self):
         self.assertEquals("this is a test", self.doc.title)
 
@@ -351,6 +442,81 @@ class HTMLDocumentTest(unittest.TestCase):
 
         self.assertEquals("<head><title>Hello World</title><meta /></head>", str(doc.getElementsByTagName('head')[0]))
 
+    def testWriteChunks(self):
+        p = self.doc.getElementById('hello')
+
+        self.doc.current = p.tag
+        self.doc.write("<scr")
+        self.doc.write("ipt>var a = 1;</scr")
+        self.doc.write("ipt><title>a &amp; <b>b</b></ti")
+        self.doc.write("tle>")
+
+        script = p.tag.next_sibling
+
+        self.assertEquals("script", script.name)
+        self.assertEquals("var a = 1;", script.string)
+
+        title = script.next_sibling
+
+        self.assertEquals("title", title.name)
+        self.assertEquals("a & <b>b</b>", title.string)
+        self.failIf(title.find('b'))
+
+        self.doc.write("<table><tr><td>x")
+
+        self.failIf(self.doc.doc.find('table'))
+
+        self.doc.write("</td></tr></table><p>y</p>")
+
+        table = title.next_sibling
+
+        self.assertEquals("table", table.name)
+        self.assertEquals(["tbody"], [c.name for c in table.contents])
+        self.assertEquals("x", table.find('td').string)
+        self.assertEquals("p", table.next_sibling.name)
+
+        self.doc.write("<select><option>a<option>b")
+        self.doc._endWrite()
+
+        select = table.next_sibling.next_sibling
+
+        self.assertEquals("select", select.name)
+        self.assertEquals(["a", "b"], [o.string for o in select.find_all('option')])
+
+    def testInnerHTML(self):
+        div = self.doc.createElement('div')
+
+        div.innerHTML = "<p id='a'>x<b>y</b></p>text<br><ul><li>1<li>2</ul>"
+
+        self.assertEquals(['p', None, 'br', 'ul'], [getattr(c, 'name', None) for c in div.tag.contents])
+        self.assertEquals('a', div.tag.p['id'])
+        self.assertEquals(['x', 'b'], [getattr(c, 'name', None) or c for c in div.tag.p.contents])
+        self.assertEquals(['1', '2'], [li.string for li in div.tag.ul.find_all('li')])
+        self.assertEquals(4, div.childNodes.length)
+
+        div.innerHTML = "text"
+
+        self.assertEquals(["text"], div.tag.contents)
+
+    def testFragmentFallback(self):
+        div = self.doc.createElement('div')
+
+        div.innerHTML = "<table>foo<tr><td>a</td></tr></table>"
+
+        self.assertEquals("foo<table><tbody><tr><td>a</td></tr></tbody></table>", div.innerHTML)
+
+        div.innerHTML = "<select><option>a<option>b</select>"
+
+        self.assertEquals("<select><option>a</option><option>b</option></select>", div.innerHTML)
+
+        div.innerHTML = "<textarea>&lt;b&gt; <i>x</i></textarea>"
+
+        self.assertEquals("<b> <i>x</i>", div.tag.find('textarea').string)
+
+        div.innerHTML = "<![foo[ x ]]><p>a</p>"
+
+        self.assertEquals("<p>a</p>", str(div.tag.find('p')))
+
 
 class CSSStyleDeclarationTest(unittest.TestCase):
     def testParse(self):
@@ -375,6 +541,49 @@ class CSSStyleDeclarationTest(unittest.TestCase):
         self.assertEquals('none', css.width)
 
 
+STYLE_HTML = """
+<html>
+    <head>
+        <style>
+            .hidden { display: none }
+            p { color: red }
+        </style>
+    </head>
+    <body>
+        <p id="hello" class="hidden">Hello World!</p>
+    </body>
+</html>"""
+
+class StyleEngineTest(unittest.TestCase):
+    def setUp(self):
+        self.doc = parseString(STYLE_HTML)
+
+        self.assert_(self.doc)
+
+    def testRemoveAttribute(self):
+        p = self.doc.getElementById('hello')
+
+        self.assertEquals('none', getStyleEngine(p.tag).computeStyle(p.tag)['display'])
+
+        p.removeAttribute('class')
+
+        self.assertEquals('block', getStyleEngine(p.tag).computeStyle(p.tag)['display'])
+
+    def testInlineStyle(self):
+        p = self.doc.getElementById('hello')
+
+        p.setAttribute('style', 'background-image: url(http://www.example.com/a.png); color: blue')
+
+        style = getStyleEngine(p.tag).computeStyle(p.tag)
+
+        self.assertEquals('url(http://www.example.com/a.png)', style['background-image'])
+        self.assertEquals('blue', style['color'])
+
+        p.style.color = 'green'
+
+        self.assertEquals('green', getStyleEngine(p.tag).computeStyle(p.tag)['color'])
+
+
 if __name__ == '__main__':
     logging.basicConfig(level=logging.DEBUG if "-v" in sys.argv else logging.WARN,
                         format='%(asctime)s %(levelname)s %(message)s')
@@ -17,8 +17,6 @@
 # MA  02111-1307  USA
 
 import os
-import sched
-import time
 import logging
 import chardet
 import PyV8
@@ -26,11 +24,13 @@ import traceback
 import numbers
 import datetime
 import collections
+import contextlib
 import urllib
 import new
 import bs4 as BeautifulSoup
 import jsbeautifier
 from .W3C import *
+from .W3C.Style.CSS.StyleEngine import getStyleEngine
 from .Navigator import Navigator
 from .Location import Location
 from .Screen import Screen
@@ -44,10 +44,15 @@ from .Console import Console
 from .Components import Components
 from .Crypto import Crypto
 from .CCInterpreter import CCInterpreter
+from .TimerQueue import TimerQueue
+from .ScriptCache import script_cache
+from .ContextPool import context_pool
+from .GCScheduler import gc_scheduler
+from .Tracing import span
+from .BridgeProfiler import bridge_profiler
 from ActiveX.ActiveX import _ActiveXObject
 from Java.java import java
 
-sched = sched.scheduler(time.time, time.sleep)
 log = logging.getLogger("Thug")
 
 
@@ -56,22 +61,16 @@ class Window(PyV8.JSClass):
         def __init__(self, window, code, delay, repeat, lang = 'JavaScript'):
             self.window  = window
             self.code    = code
-            self.delay   = float(delay) / 1000
+            self.delay   = max(float(delay), 0)
             self.repeat  = repeat
             self.lang    = lang
             self.running = True
 
         def start(self):
-            self.event = sched.enter(self.delay, 1, self.execute, ())
-            try:
-                sched.run()
-            except:
-                pass
+            self.window.timer_queue.schedule(self, self.delay)
 
         def stop(self):
             self.running = False
-            if self.event in sched.queue:
-                sched.cancel(self.event)
 
         def execute(self):
             if not self.running:
@@ -79,17 +78,17 @@ class Window(PyV8.JSClass):
 
             log.debug(str(self.code))
 
-            with self.window.context as ctx:
+            with self.window._runningScript(), self.window.context as ctx, bridge_profiler.js():
                 if isinstance(self.code, basestring):
-                    return ctx.eval(self.code)
+                    ctx.eval(self.code)
                 elif isinstance(self.code, PyV8.JSFunction):
-                    return self.code()
+                    self.code()
                 else:
                     log.warning("Error while handling Window timer")
                     return
 
-            if self.repeat:
-                self.start()
+            if self.repeat and self.running:
+                self.window.timer_queue.schedule(self, max(self.delay, TimerQueue.MIN_INTERVAL))
         
     def __init__(self, url, dom_or_doc, navigator = None, personality = 'winxpie60', name="", 
                  target='_blank', parent = None, opener = None, replace = False, screen = None, 
@@ -115,6 +114,7 @@ class Window(PyV8.JSClass):
         self._screen = screen or Screen(width, height, 32)
         self._closed = False
         self._context = None
+        self._pooled  = None
         
         self._personality = personality
         self.__init_personality()
@@ -129,6 +129,8 @@ class Window(PyV8.JSClass):
         self.outerWidth    = width
         self.outerHeight   = height
         self.timers        = []
+        self.timer_queue   = TimerQueue()
+        self._opened       = list()
         self.java          = java()
 
     def __getattr__(self, name):
@@ -146,16 +148,30 @@ class Window(PyV8.JSClass):
         if name in ('__members__', '__methods__'):
             raise AttributeError(name)
 
+        # Names which are not JS globals either are remembered until some
+        # JS code ran (see _runningScript) or the name is assigned, so
+        # feature detection probes (i.e. window.opera) are not evaluated
+        # every time. While a script runs, it may define the name itself
+        # (i.e. `var name' or a function declaration) so a cached miss is
+        # confirmed against the context globals first
+        misses = self.__dict__.setdefault('_misses', set())
+        if name in misses:
+            if not self.__dict__.get('_running', 0) or not self._defined(name):
+                raise AttributeError(name)
+
+            misses.discard(name)
+
         try:
             symbol = self.context.eval(name)
         except:
+            misses.add(name)
             raise AttributeError(name)
 
         if isinstance(symbol, PyV8.JSFunction):
             _method = None
 
-            for _name in ('eval', 'unescape', ):
-                if symbol == self.context.eval(_name):
+            for builtin in self._builtins():
+                if symbol == builtin:
                     _method = symbol.clone()
                     break
 
@@ -176,8 +192,77 @@ class Window(PyV8.JSClass):
             self.context.locals[name] = symbol
             return symbol
 
+        misses.add(name)
         raise AttributeError(name)
 
+    def __setattr__(self, name, value):
+        misses = self.__dict__.get('_misses', None)
+        if misses:
+            misses.discard(name)
+
+        if name in ('eval', 'unescape', ):
+            self.__dict__.pop('_builtinFunctions', None)
+
+        PyV8.JSClass.__setattr__(self, name, value)
+
+    def _builtins(self):
+        """
+        The JS eval and unescape functions, resolved once per context.
+        """
+        builtins = self.__dict__.get('_builtinFunctions', None)
+        if builtins is None:
+            builtins = [self.context.eval(name) for name in ('eval', 'unescape', )]
+            self.__dict__['_builtinFunctions'] = builtins
+
+        return builtins
+
+    def _defined(self, name):
+        """
+        Tells whether JS code defined `name' since it was found missing.
+        The globals defined by the running script do not go through
+        __setattr__ so the context global object is checked. V8 asks the
+        window itself for `name' while checking and such nested lookup
+        is answered by the cache.
+        """
+        checking = self.__dict__.setdefault('_checking', set())
+        if name in checking:
+            return False
+
+        checking.add(name)
+
+        try:
+            return name in self.context.locals
+        except:
+            return False
+        finally:
+            checking.discard(name)
+
+    def _flushMisses(self):
+        misses = self.__dict__.get('_misses', None)
+        if misses:
+            misses.clear()
+
+    @contextlib.contextmanager
+    def _runningScript(self):
+        """
+        Wraps every execution of JS code. Such code may define globals
+        without going through __setattr__ (i.e. `var name' or a function
+        declaration) so the names found missing are forgotten once it
+        ends. While it runs, the cached misses are confirmed by _defined.
+        The markup written by the code is complete once the outermost
+        script ends.
+        """
+        self.__dict__['_running'] = self.__dict__.get('_running', 0) + 1
+
+        try:
+            yield
+        finally:
+            self.__dict__['_running'] -= 1
+            self._flushMisses()
+
+            if not self.__dict__['_running'] and hasattr(self.doc, '_endWrite'):
+                self.doc._endWrite()
+
     @property 
     def closed(self):
         return self._closed
@@ -672,11 +757,11 @@ class Window(PyV8.JSClass):
         pass
 
     def _attachEvent(self, sEvent, fpNotify):
-        log.debug("[attachEvent] %s %s" % (sEvent, fpNotify, ))
+        log.debug("[attachEvent] %s %s", sEvent, fpNotify)
         setattr(self, sEvent.lower(), fpNotify)
     
     def _detachEvent(self, sEvent, fpNotify):
-        log.debug("[detachEvent] %s %s" % (sEvent, fpNotify, ))
+        log.debug("[detachEvent] %s %s", sEvent, fpNotify)
         notify = getattr(self, sEvent.lower(), None)
         if notify is None:
             return
@@ -685,11 +770,11 @@ class Window(PyV8.JSClass):
             delattr(self, sEvent.lower())
     
     def _addEventListener(self, type, listener, useCapture = False):
-        log.debug("[addEventListener] %s %s %s" % (type, listener, useCapture, ))
+        log.debug("[addEventListener] %s %s %s", type, listener, useCapture)
         setattr(self, 'on%s' % (type.lower(), ), listener)
     
     def _removeEventListener(self, type, listener, useCapture = False):
-        log.debug("[removeEventListener] %s %s %s" % (type, listener, useCapture, ))
+        log.debug("[removeEventListener] %s %s %s", type, listener, useCapture)
         _listener = getattr(self, 'on%s' % (type.lower(), ), None)
         if _listener is None:
             return
@@ -777,33 +862,47 @@ class Window(PyV8.JSClass):
         if script is None:
             return
 
-        if len(script) > 4:
+        # Beautifying large scripts is expensive so it is done only
+        # if the result is going to be logged
+        if len(script) > 4 and log.isEnabledFor(logging.INFO):
             try:
                 log.info(jsbeautifier.beautify(script))
             except:
                 log.info(script)
 
         if len(script) > 64: 
-            log.warning("[Window] Eval argument length > 64 (%d)" % (len(script), ))
+            log.warning("[Window] Eval argument length > 64 (%d)", len(script))
 
         return self.evalScript(script)
 
     @property
     def context(self):
         if self._context is None:
-            self._context = PyV8.JSContext(self)
-            #with self._context:
-            #with self._context as ctxt:
-                #thug_js = os.path.join(os.path.dirname(os.path.abspath(__file__)), "thug.js")
-                #print ctxt.eval(open(thug_js, 'r').read())
-
-                #if log.ThugOpts.Personality.isIE() and log.ThugOpts.Personality.browserVersion < '8.0':
-                #    sessionstorage_js = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sessionStorage.js")
-                #    ctxt.eval(open(sessionstorage_js, 'r').read())
+            if log.ThugOpts.context_pool_size:
+                self._pooled  = context_pool.acquire(self)
+                self._context = self._pooled.context
+            else:
+                self._context = PyV8.JSContext(self)
 
-                #PyV8.JSEngine.collect()
         return self._context
 
+    def releaseContext(self):
+        """
+        Give the JS context back to the context pool once the analysis of
+        the window is over. Only the owner of the window may call it (the
+        window can not be used anymore) and nothing is done if the window
+        context does not come from the pool.
+        """
+        if self._pooled is None or not log.ThugOpts.context_pool_size:
+            return
+
+        context_pool.release(self._pooled, log.ThugOpts.context_pool_size)
+
+        self._pooled  = None
+        self._context = None
+        self.__dict__.pop('_builtinFunctions', None)
+        self._flushMisses()
+
     def evalScript(self, script, tag=None):
         result = 0
 
@@ -821,23 +920,24 @@ class Window(PyV8.JSClass):
             else:
                 self.doc.current = self.doc.doc.contents[-1]
 
-        with self.context as ctxt:
-            if log.ThugOpts.Personality.isIE():
-                cc = CCInterpreter()
-                script = cc.run(script)
-
-            try:
-                result = ctxt.eval(script)
-                print "!"*100, 'eval', len(script), result
-            except UnicodeDecodeError:
-                enc = chardet.detect(script)
-                result = ctxt.eval(script.decode(enc['encoding']))
-                print "!"*100, 'eval', len(script), result
-            except:
-                traceback.print_exc()
-                #print script
-            finally:
-                PyV8.JSEngine.collect()
+        with span('js.eval', length = len(script)):
+            with self._runningScript(), self.context as ctxt:
+                if log.ThugOpts.Personality.isIE():
+                    cc = CCInterpreter()
+                    script = cc.run(script)
+
+                try:
+                    result = script_cache.eval(ctxt, script)
+                    log.debug("[Window] Eval (%d bytes) result: %s", len(script), result)
+                except UnicodeDecodeError:
+                    enc = chardet.detect(script)
+                    result = script_cache.eval(ctxt, script.decode(enc['encoding']))
+                    log.debug("[Window] Eval (%d bytes) result: %s", len(script), result)
+                except:
+                    traceback.print_exc()
+                    #print script
+                finally:
+                    gc_scheduler.evaluated()
 
         return result
 
@@ -872,6 +972,24 @@ class Window(PyV8.JSClass):
 
         return ''.join(sc)
 
+    def runTimers(self, budget = None, limit = None, callback = None):
+        """
+        Drain the pending setTimeout/setInterval timers in virtual time.
+
+        budget is the amount of virtual time (in milliseconds) the clock
+        is allowed to advance (default: ThugOpts.timers_budget), limit is
+        the number of timer executions allowed to the window (default:
+        ThugOpts.timers_limit, 0 means no limit) and callback is called
+        after each timer. Returns the number of executed timers.
+        """
+        if budget is None:
+            budget = log.ThugOpts.timers_budget
+
+        if limit is None:
+            limit = log.ThugOpts.timers_limit
+
+        return self.timer_queue.run(budget, limit, callback)
+
     def fireOnloadEvents(self):
         #for tag in self._findAll('script'):
         #   self.evalScript(tag.string, tag = tag)
@@ -920,7 +1038,20 @@ class Window(PyV8.JSClass):
         return _ActiveXObject(self, 'microsoft.xmlhttp')
 
     def getComputedStyle(self, element, pseudoelt = None):
-        return getattr(element, 'style', None)
+        tag = getattr(element, 'tag', None)
+        if tag is None:
+            return getattr(element, 'style', None)
+
+        # The inline style is all there is without the style engine
+        engine = getStyleEngine(tag)
+        if engine is None:
+            return getattr(element, 'style', None)
+
+        try:
+            return engine.getComputedStyle(tag)
+        except:
+            log.warning("[Window] getComputedStyle failed, falling back to the inline style")
+            return getattr(element, 'style', None)
 
     def open(self, url=None, name='_blank', specs='', replace=False):
         if url:
@@ -951,7 +1082,7 @@ class Window(PyV8.JSClass):
             html = ''
             kwds = {}
        
-        dom = BeautifulSoup.BeautifulSoup(html, "html.parser")
+        dom = w3c.parseHTML(html, "html.parser")
         
         for spec in specs.split(','):
             spec = [s.strip() for s in spec.split('=')]
@@ -966,5 +1097,10 @@ class Window(PyV8.JSClass):
             else:
                 kwds['target'] = '_blank'
 
-        return Window(url, dom, navigator=None, personality=self._personality, 
+        window = Window(url, dom, navigator=None, personality=self._personality, 
                         name=name, parent=self, opener=self, replace=replace, **kwds)
+
+        # The timers of the opened windows are run along with the ones of
+        # their opener (see DFT.run_timers)
+        self._opened.append(window)
+        return window
@@ -0,0 +1,107 @@
+/*
+ * Snapshot of the JS builtins of a pooled context (see ContextPool)
+ *
+ * Evaluates to a function telling whether the builtin objects, their
+ * prototypes and the global bindings of the builtins are still the ones
+ * recorded when the context was created. A page changing any of them
+ * (i.e. Object.prototype.x = 1 or String.prototype.replace = f) leaves a
+ * context which can not be reused by the next page.
+ */
+
+(function (global) {
+    var getOwnPropertyNames      = Object.getOwnPropertyNames;
+    var getOwnPropertyDescriptor = Object.getOwnPropertyDescriptor;
+    var getPrototypeOf           = Object.getPrototypeOf;
+    var isExtensible             = Object.isExtensible;
+
+    var names = ['Object', 'Function', 'Array', 'String', 'Number', 'Boolean', 'Date', 'RegExp',
+                 'Error', 'EvalError', 'RangeError', 'ReferenceError', 'SyntaxError', 'TypeError',
+                 'URIError', 'Math', 'JSON', 'eval', 'escape', 'unescape', 'parseInt', 'parseFloat',
+                 'isNaN', 'isFinite', 'decodeURI', 'decodeURIComponent', 'encodeURI',
+                 'encodeURIComponent'];
+
+    var bindings = [];
+    var objects  = [];
+    var shapes   = [];
+    var entries  = [];
+
+    function same(a, b) {
+        // NaN is the only value not equal to itself
+        return a === b || (a !== a && b !== b);
+    }
+
+    function record(object) {
+        if (object === null || object === undefined)
+            return;
+
+        if (typeof object !== 'object' && typeof object !== 'function')
+            return;
+
+        if (objects.indexOf(object) >= 0)
+            return;
+
+        var keys = getOwnPropertyNames(object);
+
+        objects.push(object);
+        shapes.push([object, keys.length, isExtensible(object), getPrototypeOf(object)]);
+
+        // The static properties of RegExp (i.e. $1 and lastMatch) change
+        // with every match
+        if (object === RegExp)
+            return;
+
+        for (var i = 0; i < keys.length; i++) {
+            var d = getOwnPropertyDescriptor(object, keys[i]);
+            entries.push([object, keys[i], d.value, d.get, d.set, d.writable, d.configurable]);
+        }
+    }
+
+    for (var i = 0; i < names.length; i++) {
+        var value = global[names[i]];
+
+        // Names resolved by the window (through the Python bridge) may not
+        // return the same object twice and are not recorded
+        if (value === undefined || value !== global[names[i]])
+            continue;
+
+        bindings.push([names[i], value]);
+
+        record(value);
+
+        if (typeof value === 'function')
+            record(value.prototype);
+    }
+
+    return function () {
+        var i, e, d;
+
+        for (i = 0; i < bindings.length; i++) {
+            if (global[bindings[i][0]] !== bindings[i][1])
+                return false;
+        }
+
+        for (i = 0; i < shapes.length; i++) {
+            e = shapes[i];
+
+            if (getOwnPropertyNames(e[0]).length !== e[1] ||
+                isExtensible(e[0]) !== e[2] ||
+                getPrototypeOf(e[0]) !== e[3])
+                return false;
+        }
+
+        for (i = 0; i < entries.length; i++) {
+            e = entries[i];
+            d = getOwnPropertyDescriptor(e[0], e[1]);
+
+            if (!d ||
+                !same(d.value, e[2]) ||
+                d.get !== e[3] ||
+                d.set !== e[4] ||
+                d.writable !== e[5] ||
+                d.configurable !== e[6])
+                return false;
+        }
+
+        return true;
+    };
+})(this);
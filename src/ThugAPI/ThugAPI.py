@@ -28,9 +28,17 @@ except ImportError:
 
 from DOM.W3C import w3c
 from DOM import Window, DFT, MIMEHandler, SchemeHandler
+from DOM.ConnectionPool import connection_pool
+from DOM.ScriptCache import script_cache
+from DOM.ContextPool import context_pool
+from DOM.GCScheduler import gc_scheduler
+from DOM.Tracing import Tracer
+from DOM.BridgeProfiler import bridge_profiler
+from DOM.JSLock import locked
 from Logging.ThugLogging import ThugLogging
 
 from .IThugAPI import IThugAPI
+from .ThugSession import ThugSession
 from .ThugOpts import ThugOpts
 from .ThugVulnModules import ThugVulnModules
 from .OpaqueFilter import OpaqueFilter
@@ -50,12 +58,19 @@ class ThugAPI:
     def __init__(self, args):
         self.args               = args
         self.thug_version       = __thug_version__
+        # The analysis state set below belongs to this session which is
+        # active in the creating thread. Other threads have to enter it
+        # (i.e. `with api.session:') before using the API
+        ThugSession.install()
+        self.session            = ThugSession()
+        self.session.activate()
         log.ThugOpts            = ThugOpts()
         log.ThugVulnModules     = ThugVulnModules()
         log.MIMEHandler         = MIMEHandler.MIMEHandler()
         log.SchemeHandler       = SchemeHandler.SchemeHandler()
         log.JSClassifier        = JSClassifier.JSClassifier()
         log.URLClassifier       = URLClassifier.URLClassifier()
+        log.ThugTracer          = None
 
     def __call__(self):
         self.analyze()
@@ -85,6 +100,18 @@ class ThugAPI:
     def set_delay(self, delay):
         log.ThugOpts.delay = delay
 
+    def get_timers_budget(self):
+        return log.ThugOpts.timers_budget
+
+    def set_timers_budget(self, budget):
+        log.ThugOpts.timers_budget = budget
+
+    def get_timers_limit(self):
+        return log.ThugOpts.timers_limit
+
+    def set_timers_limit(self, limit):
+        log.ThugOpts.timers_limit = limit
+
     def get_referer(self):
         return log.ThugOpts.referer
 
@@ -109,6 +136,107 @@ class ThugAPI:
     def set_no_cache(self):
         log.ThugOpts.cache = None
 
+    def get_cache_backend(self):
+        return log.ThugOpts.cache
+
+    def set_cache_backend(self, backend):
+        # backend is either the path of the SQLite cache file or an object
+        # implementing the httplib2 cache interface (get, set and delete)
+        log.ThugOpts.cache = backend
+
+    def set_cache_size(self, size):
+        log.ThugOpts.cache_size = size
+
+    def get_connection_pool_size(self):
+        return log.ThugOpts.connection_pool_size
+
+    def set_connection_pool_size(self, size):
+        log.ThugOpts.connection_pool_size = size
+
+    def get_connection_idle_timeout(self):
+        return log.ThugOpts.connection_idle_timeout
+
+    def set_connection_idle_timeout(self, timeout):
+        log.ThugOpts.connection_idle_timeout = timeout
+
+    def get_prefetch_workers(self):
+        return log.ThugOpts.prefetch_workers
+
+    def set_prefetch_workers(self, workers):
+        log.ThugOpts.prefetch_workers = workers
+
+    def get_connection_stats(self):
+        return connection_pool.stats
+
+    def get_script_cache_size(self):
+        return log.ThugOpts.script_cache_size
+
+    def set_script_cache_size(self, size):
+        log.ThugOpts.script_cache_size = size
+
+    def get_script_cache_stats(self):
+        return script_cache.stats
+
+    def load_script_cache(self, path):
+        script_cache.load(path)
+
+    def save_script_cache(self, path):
+        script_cache.save(path)
+
+    def get_context_pool_size(self):
+        return log.ThugOpts.context_pool_size
+
+    def set_context_pool_size(self, size):
+        log.ThugOpts.context_pool_size = size
+
+    def warmup_context_pool(self, count = None):
+        if count is None:
+            count = log.ThugOpts.context_pool_size
+
+        with locked():
+            context_pool.warmup(Window.Window, log.ThugOpts.useragent, count)
+
+    def get_parser(self):
+        return log.ThugOpts.parser
+
+    def set_parser(self, parser):
+        log.ThugOpts.parser = parser
+
+    def get_gc_policy(self):
+        return log.ThugOpts.gc_policy
+
+    def set_gc_policy(self, policy):
+        log.ThugOpts.gc_policy = policy
+
+    def set_gc_interval(self, interval):
+        log.ThugOpts.gc_interval = interval
+
+    def set_gc_heap_limit(self, limit):
+        log.ThugOpts.gc_heap_limit = limit
+
+    def get_gc_stats(self):
+        with locked():
+            return gc_scheduler.stats
+
+    def set_tracing(self):
+        log.ThugTracer = Tracer()
+
+    def get_trace_summary(self, top = 10):
+        return log.ThugTracer.summary(top) if log.ThugTracer else None
+
+    def save_trace(self, path):
+        if log.ThugTracer:
+            log.ThugTracer.export(path)
+
+    def set_bridge_profiling(self):
+        bridge_profiler.install()
+
+    def get_bridge_profile(self, top = 20):
+        return bridge_profiler.report(top)
+
+    def reset_bridge_profile(self):
+        bridge_profiler.reset()
+
     def set_ast_debug(self):
         log.ThugOpts.ast_debug = True
 
@@ -176,17 +304,26 @@ class ThugAPI:
 
     def run(self, window):
         dft = DFT.DFT(window)
-        dft.run()
+
+        try:
+            dft.run()
+        finally:
+            # The analysis is over so a pooled context goes back to the pool
+            window.releaseContext()
 
     def run_local(self, url):
         log.ThugLogging.set_url(url)
         log.ThugOpts.local = True
 
         html   = open(url, 'r').read()
-        doc    = w3c.parseString(html)
-        window = Window.Window('about:blank', doc, personality = log.ThugOpts.useragent)
-        window.open()
-        self.run(window)
+
+        with locked():
+            doc    = w3c.parseString(html)
+            window = Window.Window('about:blank', doc, personality = log.ThugOpts.useragent)
+            window.open()
+            self.run(window)
+
+        return window
 
     def run_remote(self, url):
         scheme = urlparse.urlparse(url).scheme
@@ -196,11 +333,14 @@ class ThugAPI:
 
         log.ThugLogging.set_url(url)
 
-        doc    = w3c.parseString('')
-        window = Window.Window(log.ThugOpts.referer, doc, personality = log.ThugOpts.useragent)
-        window = window.open(url)
-        if window:
-            self.run(window)
+        with locked():
+            doc    = w3c.parseString('')
+            window = Window.Window(log.ThugOpts.referer, doc, personality = log.ThugOpts.useragent)
+            window = window.open(url)
+            if window:
+                self.run(window)
+
+        return window
 
     @abstractmethod
     def analyze(self):
@@ -0,0 +1,271 @@
+#!/usr/bin/env python
+#
+# ThugBatch.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import os
+import sys
+import time
+import json
+import errno
+import select
+import signal
+import logging
+import importlib
+import multiprocessing
+
+log = logging.getLogger("Thug")
+
+# Pure Python modules imported by the batch process before the workers
+# are started, so the workers do not load them again. V8 must not be
+# initialised in a process which is going to fork and none of them
+# imports PyV8 (the DOM is imported by the workers, see ThugBatchWorker
+# and ThugForkServer for a parent importing the DOM as well)
+preloaded = ('bs4',
+             'html5lib',
+             'lxml',
+             'soupsieve',
+             'cssutils',
+             'jsbeautifier',
+             'chardet',
+             'httplib2',
+             'DOM.Personality',
+             'DOM.HTTPCache',
+             'DOM.W3C.ParserBackend',
+             'ThugAPI.ThugOpts',
+             'ThugAPI.ThugVulnModules', )
+
+
+def _worker(conn, options, maxtasks):
+    # The batch is interrupted by the parent process
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    from .ThugBatchWorker import BatchWorker
+    worker = BatchWorker(options)
+
+    for i in range(maxtasks):
+        try:
+            task = conn.recv()
+        except EOFError:
+            break
+
+        if task is None:
+            break
+
+        conn.send(worker.analyze(*task))
+
+    conn.close()
+
+
+class BatchJob(object):
+    def __init__(self, url, timeout, deadline):
+        self.url      = url
+        self.timeout  = timeout
+        self.deadline = deadline
+
+
+class BatchProcess(object):
+    """
+        Worker process of ThugBatch analysing up to `maxtasks' URLs, one
+        at a time, and the job it is running.
+    """
+    def __init__(self, options, maxtasks):
+        self.conn, conn = multiprocessing.Pipe()
+
+        self.process = multiprocessing.Process(target = _worker, args = (conn, options, maxtasks))
+        self.process.daemon = True
+        self.process.start()
+        conn.close()
+
+        self.tasks = maxtasks
+        self.job   = None
+
+    def submit(self, url, options, timeout, deadline):
+        self.conn.send((url, options, timeout))
+        self.tasks -= 1
+        self.job    = BatchJob(url, timeout, deadline)
+
+    def kill(self):
+        try:
+            os.kill(self.process.pid, signal.SIGKILL)
+        except OSError as e:
+            if e.errno not in (errno.ESRCH, ):
+                raise
+
+        self.process.join()
+        self.conn.close()
+
+    def stop(self):
+        try:
+            self.conn.send(None)
+        except (IOError, OSError):
+            pass
+
+        self.process.join(1)
+        if self.process.is_alive():
+            self.kill()
+        else:
+            self.conn.close()
+
+
+class ThugBatch(object):
+    """
+        Analyses a list (or a stream) of URLs in a pool of worker
+        processes and writes one JSON line per URL to `output'.
+
+        Every item is either an URL or a dictionary (or a JSON object) with
+        an 'url' key and the ThugOpts values (i.e. 'threshold') overriding
+        `options' for that URL. Invalid items (i.e. malformed JSON or
+        without an 'url') are reported as errors. Each URL is given `timeout' seconds, past which no more
+        resources are fetched. A worker still busy `grace' seconds later
+        is killed and replaced and the URL is reported as timed out. A
+        worker crash is reported as an error of the URL it was analysing.
+        Workers are replaced after `maxtasks' analyses so the memory of
+        a worker can not grow without bounds.
+
+        The batch process itself never imports PyV8.
+    """
+    grace     = 10
+    preloaded = preloaded
+
+    def __init__(self, workers = 4, maxtasks = 100, timeout = 60, options = None, output = sys.stdout):
+        self.workers  = workers
+        self.maxtasks = maxtasks
+        self.timeout  = timeout
+        self.options  = options or dict()
+        self.output   = output
+
+    def _item(self, item):
+        if isinstance(item, basestring) and item.startswith('{'):
+            item = json.loads(item)
+
+        if isinstance(item, dict):
+            if not item.get('url', None):
+                raise ValueError("No url given")
+
+            options = dict(self.options)
+            options.update(item)
+            url     = options.pop('url')
+            timeout = options.pop('timeout', self.timeout)
+            return url, options, int(timeout)
+
+        return item, self.options, self.timeout
+
+    def _next(self, items):
+        # Invalid items are reported as errors and skipped
+        while True:
+            item = next(items)
+
+            try:
+                return self._item(item)
+            except (ValueError, TypeError) as e:
+                url = item.get('url', None) if isinstance(item, dict) else item
+                self._write({'url': url, 'status': 'error', 'error': 'Invalid item: %s' % (e, )})
+
+    def _write(self, result):
+        self.output.write(json.dumps(result) + "\n")
+        self.output.flush()
+
+    def preload(self):
+        for name in self.preloaded:
+            try:
+                importlib.import_module(name)
+            except ImportError:
+                pass
+
+    def _spawn(self):
+        return BatchProcess(self.options, self.maxtasks)
+
+    def _receive(self, worker):
+        job        = worker.job
+        worker.job = None
+
+        try:
+            result = worker.conn.recv()
+        except (EOFError, IOError):
+            worker.process.join()
+            self._write({'url': job.url, 'status': 'error', 'error': 'Worker exited with status %s' % (worker.process.exitcode, )})
+            return False
+
+        self._write(result)
+
+        # The worker exits once it analysed `maxtasks' URLs
+        if worker.tasks <= 0:
+            worker.process.join()
+            worker.conn.close()
+            return False
+
+        return True
+
+    def _kill(self, worker):
+        job        = worker.job
+        worker.job = None
+
+        worker.kill()
+        self._write({'url': job.url, 'status': 'timeout', 'error': 'Killed after %d seconds' % (job.timeout, )})
+
+    def run(self, items):
+        self.preload()
+
+        items   = iter(items)
+        workers = [self._spawn() for i in range(self.workers)]
+        done    = False
+
+        try:
+            while True:
+                for worker in workers:
+                    if done or worker.job is not None:
+                        continue
+
+                    try:
+                        url, options, timeout = self._next(items)
+                    except StopIteration:
+                        done = True
+                        break
+
+                    worker.submit(url, options, timeout, time.time() + timeout + self.grace)
+
+                busy = [worker for worker in workers if worker.job is not None]
+                if not busy:
+                    break
+
+                wait = max(min(worker.job.deadline for worker in busy) - time.time(), 0)
+
+                try:
+                    ready, _, _ = select.select([worker.conn for worker in busy], [], [], wait)
+                except select.error as e:
+                    if e.args[0] in (errno.EINTR, ):
+                        continue
+                    raise
+
+                now = time.time()
+
+                for index, worker in enumerate(workers):
+                    if worker.job is None:
+                        continue
+
+                    if worker.conn in ready:
+                        if not self._receive(worker):
+                            workers[index] = self._spawn()
+                    elif worker.job.deadline <= now:
+                        self._kill(worker)
+                        workers[index] = self._spawn()
+        finally:
+            for worker in workers:
+                if worker.job is None:
+                    worker.stop()
+                else:
+                    worker.kill()
@@ -0,0 +1,122 @@
+#!/usr/bin/env python
+#
+# ThugBatchWorker.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import time
+import logging
+
+try:
+    import urllib.parse as urlparse
+except ImportError:
+    import urlparse
+
+from DOM.W3C import w3c
+from DOM import Window, DFT, MIMEHandler, SchemeHandler
+from DOM.ContextPool import context_pool
+from DOM.GCScheduler import gc_scheduler
+from DOM.JSLock import locked
+
+from .ThugSession import ThugSession
+from .ThugOpts import ThugOpts
+from .ThugVulnModules import ThugVulnModules
+
+log = logging.getLogger("Thug")
+
+
+class BatchWorker(object):
+    """
+        Analyses the URLs handed to a batch worker process (see ThugBatch).
+
+        This module imports PyV8 so it is only imported by the worker
+        processes. Every URL is analysed in a session of its own, so the
+        options, the timeout and the threshold budget are per URL.
+    """
+    def __init__(self, options, warmup = True):
+        ThugSession.install()
+
+        if warmup and options.get('context_pool_size', None):
+            with self.session(options), locked():
+                context_pool.warmup(Window.Window, log.ThugOpts.useragent, log.ThugOpts.context_pool_size)
+
+    def session(self, options):
+        session = ThugSession()
+
+        with session:
+            log.ThugOpts        = ThugOpts()
+            log.ThugVulnModules = ThugVulnModules()
+            log.MIMEHandler     = MIMEHandler.MIMEHandler()
+            log.SchemeHandler   = SchemeHandler.SchemeHandler()
+
+            for name, value in options.items():
+                setattr(log.ThugOpts, name, value)
+
+        return session
+
+    def open(self, url):
+        scheme = urlparse.urlparse(url).scheme
+
+        if not scheme or not scheme.startswith('http'):
+            url = 'http://%s' % (url, )
+
+        doc    = w3c.parseString('')
+        window = Window.Window(log.ThugOpts.referer, doc, personality = log.ThugOpts.useragent)
+        return window.open(url)
+
+    def analyze(self, url, options, timeout):
+        result = {
+            'url'      : url,
+            'status'   : 'ok',
+            'error'    : None,
+            'dom_size' : 0,
+            'dom_nodes': 0,
+            'fetched'  : [],
+            'timings'  : {},
+            'gc'       : {},
+        }
+
+        session = self.session(options)
+        start   = time.time()
+
+        with session, locked():
+            # No resource is fetched past the URL timeout. The batch process
+            # kills the worker if the analysis still does not end
+            log.ThugOpts.timeout = timeout
+
+            window = None
+
+            try:
+                window = self.open(url)
+                if window:
+                    _start = time.time()
+                    DFT.DFT(window).run()
+                    result['timings']['dft'] = time.time() - _start
+
+                    soup = window.doc.doc
+                    result['dom_size']  = len(unicode(soup))
+                    result['dom_nodes'] = len(soup.find_all(True))
+            except Exception as e:
+                result['status'] = 'error'
+                result['error']  = "%s: %s" % (e.__class__.__name__, e, )
+            finally:
+                if window:
+                    window.releaseContext()
+
+            result['gc'] = gc_scheduler.stats
+
+        result['timings']['total'] = time.time() - start
+        result['fetched']          = session.fetched
+        return result
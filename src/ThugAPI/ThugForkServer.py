@@ -0,0 +1,180 @@
+#!/usr/bin/env python
+#
+# ThugForkServer.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import os
+import json
+import time
+import errno
+import select
+import signal
+import logging
+
+from .ThugBatch import ThugBatch
+from DOM.W3C.ParserBackend import available
+
+log = logging.getLogger("Thug")
+
+
+class ForkJob(object):
+    def __init__(self, pid, fd, url, timeout, deadline):
+        self.pid      = pid
+        self.fd       = fd
+        self.url      = url
+        self.timeout  = timeout
+        self.deadline = deadline
+        self.data     = list()
+
+
+class ThugForkServer(ThugBatch):
+    """
+        Batch mode where every URL is analysed in a child forked by the
+        batch process itself.
+
+        Besides the modules preloaded by every batch process, the parent
+        imports the DOM (with all the HTML element classes, the DFT and
+        the window), the batch worker and PyV8, and parses a document and
+        a stylesheet once so the lazily built state of the parsers and of
+        cssutils is ready as well. PyV8 initialises V8 only when the first
+        JS context is created, which never happens in the parent as V8
+        can not be used across a fork. Each child starts from a
+        copy-on-write image of such state, builds its own JS context,
+        sends its result back through a pipe and exits. A child still
+        running past its deadline is killed.
+    """
+    preloaded = ThugBatch.preloaded + ('PyV8',
+                                       'DOM.W3C.w3c',
+                                       'DOM.W3C.DOMImplementation',
+                                       'DOM.W3C.Style.CSS.StyleEngine',
+                                       'DOM.Window',
+                                       'DOM.DFT',
+                                       'ThugAPI.ThugBatchWorker', )
+
+    warmup_html = "<html><head><title></title></head><body><p id='p'>p</p><table><tr><td>td</td></tr></table></body></html>"
+    warmup_css  = "p { color: red } #p { display: none }"
+
+    def preload(self):
+        ThugBatch.preload(self)
+
+        import bs4 as BeautifulSoup
+        from cssutils.parse import CSSParser
+
+        for backend in ('html.parser', 'lxml', 'html5lib', ):
+            if available(backend):
+                BeautifulSoup.BeautifulSoup(self.warmup_html, backend)
+
+        CSSParser(loglevel = logging.CRITICAL, validate = False).parseString(self.warmup_css)
+
+    def _child(self, fd, url, options, timeout):
+        try:
+            from .ThugBatchWorker import BatchWorker
+
+            # A context pool would only live as long as the child
+            worker = BatchWorker(options, warmup = False)
+            data   = json.dumps(worker.analyze(url, options, timeout))
+        except Exception as e:
+            data = json.dumps({'url': url, 'status': 'error', 'error': "%s: %s" % (e.__class__.__name__, e, )})
+
+        try:
+            with os.fdopen(fd, 'w') as pipe:
+                pipe.write(data)
+        finally:
+            os._exit(0)
+
+    def _spawn(self, url, options, timeout):
+        rfd, wfd = os.pipe()
+
+        pid = os.fork()
+        if pid == 0:
+            os.close(rfd)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            self._child(wfd, url, options, timeout)
+
+        os.close(wfd)
+        return ForkJob(pid, rfd, url, timeout, time.time() + timeout + self.grace)
+
+    def _finish(self, job, killed = False):
+        if killed:
+            try:
+                os.kill(job.pid, signal.SIGKILL)
+            except OSError as e:
+                if e.errno not in (errno.ESRCH, ):
+                    raise
+
+        os.close(job.fd)
+        pid, status = os.waitpid(job.pid, 0)
+
+        if killed:
+            self._write({'url': job.url, 'status': 'timeout', 'error': 'Killed after %d seconds' % (job.timeout, )})
+            return
+
+        # A child crashing while writing leaves a partial result
+        try:
+            result = json.loads("".join(job.data)) if job.data else None
+        except ValueError:
+            result = {'url': job.url, 'status': 'error', 'error': 'Worker %s with a partial result' % (self._status(status), )}
+
+        if result is None:
+            result = {'url': job.url, 'status': 'error', 'error': 'Worker %s without a result' % (self._status(status), )}
+
+        self._write(result)
+
+    def _status(self, status):
+        if os.WIFSIGNALED(status):
+            return "killed by signal %d" % (os.WTERMSIG(status), )
+
+        return "exited with status %d" % (os.WEXITSTATUS(status), )
+
+    def run(self, items):
+        self.preload()
+
+        items = iter(items)
+        jobs  = dict()
+        done  = False
+
+        while True:
+            while not done and len(jobs) < self.workers:
+                try:
+                    job = self._spawn(*self._next(items))
+                except StopIteration:
+                    done = True
+                    break
+
+                jobs[job.fd] = job
+
+            if not jobs:
+                break
+
+            wait = max(min(job.deadline for job in jobs.values()) - time.time(), 0)
+
+            try:
+                ready, _, _ = select.select(list(jobs.keys()), [], [], wait)
+            except select.error as e:
+                if e.args[0] in (errno.EINTR, ):
+                    continue
+                raise
+
+            for fd in ready:
+                chunk = os.read(fd, 65536)
+                if chunk:
+                    jobs[fd].data.append(chunk)
+                else:
+                    self._finish(jobs.pop(fd))
+
+            now = time.time()
+            for fd in [fd for fd, job in jobs.items() if job.deadline <= now]:
+                self._finish(jobs.pop(fd), killed = True)
@@ -28,6 +28,9 @@ except ImportError:
     import urlparse
 
 from DOM.Personality import Personality
+from DOM.HTTPCache import SQLiteCache
+from DOM.GCScheduler import GCScheduler
+from DOM.W3C.ParserBackend import backends
 
 log = logging.getLogger("Thug")
 
@@ -46,8 +49,20 @@ class ThugOpts(dict):
         self._referer    = 'about:blank'
         self._events     = list()
         self._delay      = 0
+        self._timers_budget = 60000
+        self._timers_limit  = 1000
         self._no_fetch   = False
-        self._cache      = '/tmp/thug-cache-%s' % (os.getuid(), )
+        self._cache      = '/tmp/thug-cache-%s.sqlite' % (os.getuid(), )
+        self._cache_size = 1024 * 1024 * 1024
+        self._connection_pool_size    = 4
+        self._connection_idle_timeout = 30
+        self._prefetch_workers        = 8
+        self._script_cache_size       = 256
+        self._context_pool_size       = 0
+        self._gc_policy               = 'eval'
+        self._gc_interval             = 100
+        self._gc_heap_limit           = 128 * 1024 * 1024
+        self._parser                  = None
         self.Personality = Personality()
 
     def set_proxy_info(self, proxy):
@@ -116,6 +131,34 @@ class ThugOpts(dict):
 
     delay = property(get_delay, set_delay)
 
+    def get_timers_budget(self):
+        return self._timers_budget
+
+    def set_timers_budget(self, budget):
+        try:
+            _budget = int(budget)
+        except:
+            log.warning('[WARNING] Ignoring invalid timers budget value (should be an integer)')
+            return
+
+        self._timers_budget = abs(_budget)
+
+    timers_budget = property(get_timers_budget, set_timers_budget)
+
+    def get_timers_limit(self):
+        return self._timers_limit
+
+    def set_timers_limit(self, limit):
+        try:
+            _limit = int(limit)
+        except:
+            log.warning('[WARNING] Ignoring invalid timers limit value (should be an integer)')
+            return
+
+        self._timers_limit = abs(_limit)
+
+    timers_limit = property(get_timers_limit, set_timers_limit)
+
     def get_no_fetch(self):
         return self._no_fetch
 
@@ -125,6 +168,11 @@ class ThugOpts(dict):
     no_fetch = property(get_no_fetch, set_no_fetch)
 
     def get_cache(self):
+        # A path is lazily turned into a SQLite cache backend the first
+        # time the cache is needed
+        if isinstance(self._cache, basestring):
+            self._cache = SQLiteCache(self._cache, self._cache_size)
+
         return self._cache
 
     def set_cache(self, cache):
@@ -132,6 +180,145 @@ class ThugOpts(dict):
 
     cache = property(get_cache, set_cache)
 
+    def get_cache_size(self):
+        return self._cache_size
+
+    def set_cache_size(self, size):
+        try:
+            value = int(size)
+        except:
+            log.warning('[WARNING] Ignoring invalid cache size (should be an integer)')
+            return
+
+        self._cache_size = abs(value)
+
+        if isinstance(self._cache, SQLiteCache):
+            self._cache.max_size = self._cache_size
+
+    cache_size = property(get_cache_size, set_cache_size)
+
+    def get_connection_pool_size(self):
+        return self._connection_pool_size
+
+    def set_connection_pool_size(self, size):
+        try:
+            value = int(size)
+        except:
+            log.warning('[WARNING] Ignoring invalid connection pool size (should be an integer)')
+            return
+
+        self._connection_pool_size = abs(value)
+
+    connection_pool_size = property(get_connection_pool_size, set_connection_pool_size)
+
+    def get_connection_idle_timeout(self):
+        return self._connection_idle_timeout
+
+    def set_connection_idle_timeout(self, timeout):
+        try:
+            value = int(timeout)
+        except:
+            log.warning('[WARNING] Ignoring invalid connection idle timeout (should be an integer)')
+            return
+
+        self._connection_idle_timeout = abs(value)
+
+    connection_idle_timeout = property(get_connection_idle_timeout, set_connection_idle_timeout)
+
+    def get_prefetch_workers(self):
+        return self._prefetch_workers
+
+    def set_prefetch_workers(self, workers):
+        try:
+            value = int(workers)
+        except:
+            log.warning('[WARNING] Ignoring invalid prefetch workers value (should be an integer)')
+            return
+
+        self._prefetch_workers = abs(value)
+
+    prefetch_workers = property(get_prefetch_workers, set_prefetch_workers)
+
+    def get_script_cache_size(self):
+        return self._script_cache_size
+
+    def set_script_cache_size(self, size):
+        try:
+            value = int(size)
+        except:
+            log.warning('[WARNING] Ignoring invalid script cache size (should be an integer)')
+            return
+
+        self._script_cache_size = abs(value)
+
+    script_cache_size = property(get_script_cache_size, set_script_cache_size)
+
+    def get_context_pool_size(self):
+        return self._context_pool_size
+
+    def set_context_pool_size(self, size):
+        try:
+            value = int(size)
+        except:
+            log.warning('[WARNING] Ignoring invalid context pool size (should be an integer)')
+            return
+
+        self._context_pool_size = abs(value)
+
+    context_pool_size = property(get_context_pool_size, set_context_pool_size)
+
+    def get_gc_policy(self):
+        return self._gc_policy
+
+    def set_gc_policy(self, policy):
+        if policy not in GCScheduler.policies:
+            log.warning('[WARNING] Ignoring invalid GC policy (valid policies: %s)' % (', '.join(GCScheduler.policies), ))
+            return
+
+        self._gc_policy = policy
+
+    gc_policy = property(get_gc_policy, set_gc_policy)
+
+    def get_gc_interval(self):
+        return self._gc_interval
+
+    def set_gc_interval(self, interval):
+        try:
+            value = int(interval)
+        except:
+            log.warning('[WARNING] Ignoring invalid GC interval (should be an integer)')
+            return
+
+        self._gc_interval = max(abs(value), 1)
+
+    gc_interval = property(get_gc_interval, set_gc_interval)
+
+    def get_gc_heap_limit(self):
+        return self._gc_heap_limit
+
+    def set_gc_heap_limit(self, limit):
+        try:
+            value = int(limit)
+        except:
+            log.warning('[WARNING] Ignoring invalid GC heap limit (should be an integer)')
+            return
+
+        self._gc_heap_limit = abs(value)
+
+    gc_heap_limit = property(get_gc_heap_limit, set_gc_heap_limit)
+
+    def get_parser(self):
+        return self._parser
+
+    def set_parser(self, parser):
+        if parser not in backends:
+            log.warning('[WARNING] Ignoring invalid parser (valid parsers: %s)' % (', '.join(backends), ))
+            return
+
+        self._parser = parser
+
+    parser = property(get_parser, set_parser)
+
     def get_threshold(self):
         return self._threshold
 
@@ -0,0 +1,128 @@
+#!/usr/bin/env python
+#
+# ThugSession.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import logging
+import threading
+
+_local = threading.local()
+
+
+class ThugSession(object):
+    """
+        State of a single analysis.
+
+        The analysis state (options, vulnerable modules, handlers, logging,
+        tracing and the active DFT) is read by every module as an attribute
+        of the Thug logger. Once the session logger is installed (see
+        install()) such attributes are resolved against the session active
+        in the current thread, falling back to the values set while no
+        session is active. Several analyses can then run concurrently in
+        the same process, one per thread, each one in its own session.
+
+        A session is activated in the current thread by activate() or for
+        the duration of a `with' block. The prefetcher workers run in the
+        session of the thread which submitted the request.
+
+        V8 is entered by a single thread at a time. The analyses hold the
+        V8 lock (see DOM.JSLock) while they run and give it up while they
+        wait for the network, so they overlap on the fetches. The context
+        pool, the script cache and the garbage collection scheduler are
+        shared by the sessions and locked. The personality dependent DOM
+        methods (i.e. attachEvent) are set on the DOM classes, so they are
+        shared by the sessions as they are by consecutive analyses.
+    """
+    attributes = ('ThugOpts',
+                  'ThugVulnModules',
+                  'MIMEHandler',
+                  'SchemeHandler',
+                  'JSClassifier',
+                  'URLClassifier',
+                  'ThugLogging',
+                  'ThugTracer',
+                  'DFT', )
+
+    def __init__(self):
+        # Resources fetched during the analysis (see Navigator.fetch)
+        self.fetched = list()
+
+    @staticmethod
+    def current():
+        return getattr(_local, 'session', None)
+
+    @staticmethod
+    def install():
+        """
+            Makes the Thug logger resolve the session attributes against
+            the session active in the current thread. The attributes
+            already set on the logger become the defaults used while no
+            session is active.
+        """
+        log = logging.getLogger("Thug")
+        if isinstance(log, SessionLogger):
+            return
+
+        defaults = dict()
+        for name in ThugSession.attributes:
+            if name in log.__dict__:
+                defaults[name] = log.__dict__.pop(name)
+
+        log.__dict__['_session_defaults'] = defaults
+        log.__class__ = SessionLogger
+
+    def activate(self):
+        _local.session = self
+
+    def deactivate(self):
+        if self.current() is self:
+            _local.session = None
+
+    def __enter__(self):
+        _local.__dict__.setdefault('previous', list()).append(self.current())
+        self.activate()
+        return self
+
+    def __exit__(self, type, value, traceback):
+        _local.session = _local.previous.pop()
+
+
+class SessionLogger(logging.Logger):
+    def __getattr__(self, name):
+        if name in ('ThugSession', ):
+            return ThugSession.current()
+
+        if name in ThugSession.attributes:
+            session = ThugSession.current()
+            if session is not None and name in session.__dict__:
+                return session.__dict__[name]
+
+            defaults = self.__dict__.get('_session_defaults', {})
+            if name in defaults:
+                return defaults[name]
+
+        raise AttributeError(name)
+
+    def __setattr__(self, name, value):
+        if name not in ThugSession.attributes:
+            self.__dict__[name] = value
+            return
+
+        session = ThugSession.current()
+        if session is not None:
+            setattr(session, name, value)
+        else:
+            self.__dict__.setdefault('_session_defaults', dict())[name] = value
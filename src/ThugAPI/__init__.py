@@ -1,2 +1,3 @@
+from .ThugSession import ThugSession
 from .ThugOpts import ThugOpts
 from .ThugVulnModules import ThugVulnModules
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+#
+# batch.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import sys
+import getopt
+import logging
+
+from ThugAPI.ThugBatch import ThugBatch
+from ThugAPI.ThugForkServer import ThugForkServer
+
+
+def usage():
+    msg = """
+Synopsis:
+    Thug: Pure Python honeyclient implementation (batch mode)
+
+    Usage:
+        python batch.py [ options ] [ file ]
+
+    URLs are read one per line from file (or from the standard input). A
+    line may also be a JSON object with an 'url' key and the options to
+    be used for that URL (i.e. {"url": "...", "threshold": 10}). Results
+    are written as one JSON line per URL.
+
+    Options:
+        -h, --help              \tDisplay this help information
+        -u, --useragent=        \tSelect a user agent (default: winxpie60)
+        -r, --referer=          \tSpecify a referer
+        -p, --proxy=            \tSpecify a proxy
+        -t, --threshold=        \tMaximum pages to fetch for each URL
+        -T, --timeout=          \tTimeout in seconds for each URL (default: 60)
+        -w, --workers=          \tNumber of worker processes (default: 4)
+        -m, --maxtasks=         \tAnalyses before a worker is replaced (default: 100)
+        -C, --context-pool=     \tJS contexts preloaded by each worker (default: 0)
+        -G, --gc-policy=        \tV8 garbage collection policy (eval, end, count, heap)
+        -P, --parser=           \tHTML parser (html.parser, lxml, html5lib, auto)
+        -o, --output=           \tWrite the results to the specified file
+        -F, --fork-server       \tFork a preloaded child for each URL
+        -v, --verbose           \tEnable verbose mode
+"""
+    print(msg)
+    sys.exit(0)
+
+
+def items(fd):
+    for line in fd:
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+
+        # JSON lines are parsed by ThugBatch so a malformed one is reported
+        # as an error of its own
+        yield line
+
+
+def main(args):
+    try:
+        options, args = getopt.getopt(args, 'hu:r:p:t:T:w:m:C:G:P:o:Fv',
+                ['help',
+                 'useragent=',
+                 'referer=',
+                 'proxy=',
+                 'threshold=',
+                 'timeout=',
+                 'workers=',
+                 'maxtasks=',
+                 'context-pool=',
+                 'gc-policy=',
+                 'parser=',
+                 'output=',
+                 'fork-server',
+                 'verbose',
+                ])
+    except getopt.GetoptError:
+        usage()
+
+    opts   = dict()
+    kwds   = dict()
+    output = None
+    batch  = ThugBatch
+
+    for option in options:
+        if option[0] in ('-h', '--help'):
+            usage()
+        elif option[0] in ('-u', '--useragent', ):
+            opts['useragent'] = option[1]
+        elif option[0] in ('-r', '--referer', ):
+            opts['referer'] = option[1]
+        elif option[0] in ('-p', '--proxy', ):
+            opts['proxy_info'] = option[1]
+        elif option[0] in ('-t', '--threshold', ):
+            opts['threshold'] = option[1]
+        elif option[0] in ('-C', '--context-pool', ):
+            opts['context_pool_size'] = option[1]
+        elif option[0] in ('-G', '--gc-policy', ):
+            opts['gc_policy'] = option[1]
+        elif option[0] in ('-P', '--parser', ):
+            opts['parser'] = option[1]
+        elif option[0] in ('-T', '--timeout', ):
+            kwds['timeout'] = int(option[1])
+        elif option[0] in ('-w', '--workers', ):
+            kwds['workers'] = int(option[1])
+        elif option[0] in ('-m', '--maxtasks', ):
+            kwds['maxtasks'] = int(option[1])
+        elif option[0] in ('-o', '--output', ):
+            output = option[1]
+        elif option[0] in ('-F', '--fork-server', ):
+            batch = ThugForkServer
+        elif option[0] in ('-v', '--verbose', ):
+            logging.getLogger("Thug").setLevel(logging.INFO)
+
+    logging.getLogger().addHandler(logging.StreamHandler())
+    logging.getLogger().setLevel(logging.WARNING)
+
+    fd = open(args[0], 'r') if args and args[0] not in ('-', ) else sys.stdin
+
+    if output:
+        kwds['output'] = open(output, 'a')
+
+    batch(options = opts, **kwds).run(items(fd))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+#
+# parser-benchmark.py
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License version 2 as
+# published by the Free Software Foundation.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 59 Temple Place, Suite 330, Boston,
+# MA  02111-1307  USA
+
+import os
+import sys
+import time
+import getopt
+import collections
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'src'))
+
+from DOM.W3C.ParserBackend import backends, available, consistent, parse
+
+
+def usage():
+    msg = """
+Synopsis:
+    Compares the HTML parser backends on a corpus of saved pages
+
+    Usage:
+        python parser-benchmark.py [ options ] path [ path ... ]
+
+    Every path is either an HTML file or a directory whose files are all
+    parsed. For each backend the time spent parsing the corpus is reported
+    together with the pages whose tree has not the elements found in the
+    markup (for the auto backend, the pages parsed with html5lib).
+
+    Options:
+        -h, --help              \tDisplay this help information
+        -b, --backends=         \tComma separated backends (default: all the available ones)
+        -r, --rounds=           \tTimes each page is parsed (default: 3)
+        -v, --verbose           \tList the inconsistent pages
+"""
+    print(msg)
+    sys.exit(0)
+
+
+def corpus(paths):
+    for path in paths:
+        if os.path.isdir(path):
+            for name in sorted(os.listdir(path)):
+                if os.path.isfile(os.path.join(path, name)):
+                    yield os.path.join(path, name)
+        else:
+            yield path
+
+
+def bench(pages, backend, rounds):
+    elapsed      = 0.0
+    inconsistent = list()
+
+    for path, html in pages:
+        start = time.time()
+        for i in range(rounds):
+            soup = parse(html, backend)
+        elapsed += time.time() - start
+
+        if not consistent(html, soup):
+            inconsistent.append(path)
+
+    return elapsed, inconsistent
+
+
+def main(args):
+    try:
+        options, args = getopt.getopt(args, 'hb:r:v', ['help', 'backends=', 'rounds=', 'verbose', ])
+    except getopt.GetoptError:
+        usage()
+
+    selected = [b for b in backends if b in ('auto', ) or available(b)]
+    rounds   = 3
+    verbose  = False
+
+    for option in options:
+        if option[0] in ('-h', '--help', ):
+            usage()
+        elif option[0] in ('-b', '--backends', ):
+            selected = [b.strip() for b in option[1].split(',')]
+        elif option[0] in ('-r', '--rounds', ):
+            rounds = int(option[1])
+        elif option[0] in ('-v', '--verbose', ):
+            verbose = True
+
+    if not args:
+        usage()
+
+    pages = list()
+    for path in corpus(args):
+        with open(path, 'r') as fd:
+            pages.append((path, fd.read()))
+
+    size = sum(len(html) for path, html in pages)
+    print("%d pages, %d bytes, %d rounds\n" % (len(pages), size, rounds))
+    print("%-12s %10s %10s %14s" % ('backend', 'total (s)', 'page (ms)', 'inconsistent'))
+
+    results = collections.OrderedDict()
+    for backend in selected:
+        if backend not in backends:
+            print("%-12s unknown backend" % (backend, ))
+            continue
+
+        if backend not in ('auto', ) and not available(backend):
+            print("%-12s not available" % (backend, ))
+            continue
+
+        elapsed, inconsistent = bench(pages, backend, rounds)
+        results[backend] = inconsistent
+
+        print("%-12s %10.3f %10.3f %14d" % (backend,
+                                             elapsed,
+                                             elapsed * 1000 / (len(pages) * rounds) if pages else 0,
+                                             len(inconsistent)))
+
+    if verbose:
+        for backend, inconsistent in results.items():
+            for path in inconsistent:
+                print("[%s] %s" % (backend, path))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
@@ -31,8 +31,9 @@ sudo python setup.py install
 	
 cd ..
 
-echo "Installing python libraries (beautifulsoup4, html5lib)..."
+echo "Installing python libraries (beautifulsoup4, soupsieve, html5lib)..."
 sudo pip install beautifulsoup4 1>>setup-ubuntu.log
+sudo pip install soupsieve 1>>setup-ubuntu.log
 sudo pip install html5lib 1>>setup-ubuntu.log
 
 